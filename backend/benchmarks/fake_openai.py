@@ -0,0 +1,192 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests.
+
+Answers POST /v1/chat/completions after a random delay: requests with
+response_format json_object get a plan shaped like PhasedPlanResponse
+covering the prompt's "Start Date" to "Deadline" (or a few days from today),
+other requests get a fixed reply, streamed word by word with stream=true.
+Point the app at it with OPENAI_BASE_URL:
+
+    cd backend
+    python benchmarks/fake_openai.py --port 9100 --latency-ms 800 --latency-dist lognormal
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=fake uvicorn main:app
+
+--error-rate answers a fraction of requests with a 500. The app retries
+those (see llm.py), so they mostly show up as extra latency rather than
+failed requests. GET /stats returns how many requests were served and failed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SECTIONS = ["morning", "afternoon", "evening"]
+MAX_PLAN_DAYS = 14
+REPLY = (
+    "Here is a way to break this down. Start by listing the outcomes you need by the deadline, "
+    "then split each one into tasks of an hour or two. Put the hardest work in the mornings, "
+    "reviews and small fixes in the afternoons, and keep evenings light. Check progress at the end "
+    "of every week and move anything that slipped to the next free slot."
+)
+
+
+class Settings:
+    latency_ms = 800.0  # Median time before the response (or the first streamed token)
+    latency_dist = "lognormal"  # fixed, uniform, exponential or lognormal
+    sigma = 0.5  # Spread of the lognormal distribution
+    token_ms = 15.0  # Delay between streamed tokens
+    error_rate = 0.0  # Fraction of requests answered with a 500
+    reply_words = 60  # Length of the chat reply
+
+
+settings = Settings()
+stats = {"requests": 0, "streams": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+app = FastAPI()
+
+
+def sample_latency():
+    """Seconds to wait before answering, drawn from the configured distribution."""
+    median = settings.latency_ms / 1000
+    if settings.latency_dist == "fixed":
+        return median
+    if settings.latency_dist == "uniform":
+        return random.uniform(0, 2 * median)
+    if settings.latency_dist == "exponential":
+        return random.expovariate(math.log(2) / median) if median else 0
+    return median * math.exp(random.gauss(0, settings.sigma))
+
+
+def canned_plan(prompt):
+    """A PhasedPlanResponse-shaped plan for the dates named in the prompt."""
+    start = re.search(r"Start Date:\s*(\d{4}-\d{2}-\d{2})", prompt)
+    deadline = re.search(r"Deadline:\s*(\d{4}-\d{2}-\d{2})", prompt)
+    first = datetime.strptime(start.group(1), "%Y-%m-%d").date() if start else date.today()
+    last = datetime.strptime(deadline.group(1), "%Y-%m-%d").date() if deadline else first + timedelta(days=6)
+    days = max(1, min((last - first).days + 1, MAX_PLAN_DAYS))
+    plans = []
+    for offset in range(days):
+        day = (first + timedelta(days=offset)).isoformat()
+        for section in SECTIONS:
+            plans.append({"date": day, "section": section, "tasks": [f"Step {offset + 1} ({section})"]})
+    return {"plans": plans}
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def completion(model, content, prompt_tokens):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": prompt_tokens + estimate_tokens(content),
+        },
+    }
+
+
+def chunk(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+async def stream_reply(model, words, prompt_tokens, include_usage):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    try:
+        yield f"data: {json.dumps(chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+        for n, word in enumerate(words):
+            if n:
+                await asyncio.sleep(settings.token_ms / 1000)
+            text = word if n == 0 else " " + word
+            yield f"data: {json.dumps(chunk(completion_id, model, {'content': text}))}\n\n"
+        yield f"data: {json.dumps(chunk(completion_id, model, {}, 'stop'))}\n\n"
+        if include_usage:
+            # As the API does with stream_options.include_usage: a last chunk with no choices
+            usage = completion(model, " ".join(words), prompt_tokens)["usage"]
+            yield f"data: {json.dumps({**chunk(completion_id, model, {}), 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    streaming = bool(body.get("stream"))
+    try:
+        await asyncio.sleep(sample_latency())
+        if random.random() < settings.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Simulated upstream failure", "type": "server_error"}}, status_code=500
+            )
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(canned_plan(prompt))
+        else:
+            content = " ".join((REPLY.split() * (settings.reply_words // len(REPLY.split()) + 1))[:settings.reply_words])
+        if streaming:
+            stats["streams"] += 1
+            stats["in_flight"] += 1  # Released when the stream finishes
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                stream_reply(model, content.split(" "), estimate_tokens(prompt), include_usage),
+                media_type="text/event-stream",
+            )
+        return completion(model, content, estimate_tokens(prompt))
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=Settings.latency_ms, help="median response latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential", "lognormal"],
+                        default=Settings.latency_dist)
+    parser.add_argument("--sigma", type=float, default=Settings.sigma, help="lognormal spread")
+    parser.add_argument("--token-ms", type=float, default=Settings.token_ms, help="delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=Settings.error_rate, help="fraction of requests that fail")
+    parser.add_argument("--reply-words", type=int, default=Settings.reply_words)
+    args = parser.parse_args()
+
+    settings.latency_ms = args.latency_ms
+    settings.latency_dist = args.latency_dist
+    settings.sigma = args.sigma
+    settings.token_ms = args.token_ms
+    settings.error_rate = args.error_rate
+    settings.reply_words = args.reply_words
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
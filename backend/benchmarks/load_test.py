@@ -0,0 +1,296 @@
+"""
+Drive mixed chat / extract / CRUD traffic at the app and report latency.
+
+Starts benchmarks/fake_openai.py and `uvicorn main:app` (pointed at it with
+OPENAI_BASE_URL) on a throwaway data directory, then for each concurrency
+level runs that many virtual planners for --duration seconds. Each planner
+loops over requests picked by --mix weights:
+
+- chat: POST /api/chat-plan
+- stream: POST /api/chat-plan/stream, read to the end (first-token time is
+  reported separately as stream-first)
+- extract: POST /api/extract-plan with a fresh conversation (a cache miss)
+- crud: a page of learnings, a reminders lookup, adding a learning or
+  ticking off a plan item
+
+Prints p50/p95/p99 latency and throughput per request kind and level, writes
+them to --output as JSON (by default in benchmarks/results/), and names the highest level whose overall p99
+stays under --p99-limit-ms (default: twice the p99 at the lowest level).
+
+    cd backend
+    python benchmarks/load_test.py --concurrency 1,10,25,50 --duration 20
+    python benchmarks/load_test.py --mix chat=1,extract=1 --fake-latency-ms 2000 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from multiprocess_hammer import BACKEND_DIR, free_port, wait_until_up
+from storage_bench import RESULTS_DIR, write_report
+
+TOPICS = ["a marathon", "a thesis", "a product launch", "learning Spanish", "a kitchen remodel", "an exam"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("chat", "stream", "extract", "crud"):
+            raise SystemExit(f"Unknown request kind '{name}' in --mix")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}  # kind -> [seconds]
+        self.errors = {}  # kind -> count
+
+    def record(self, kind, seconds, ok=True):
+        if ok:
+            self.latencies.setdefault(kind, []).append(seconds)
+        else:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, elapsed):
+        rows = {}
+        kinds = sorted(set(self.latencies) | set(self.errors))
+        everything = sorted(
+            seconds for kind, values in self.latencies.items() if kind != "stream-first" for seconds in values
+        )
+        for kind, values in [(kind, sorted(self.latencies.get(kind, []))) for kind in kinds] + [("all", everything)]:
+            errors = sum(self.errors.values()) if kind == "all" else self.errors.get(kind, 0)
+            rows[kind] = {
+                "requests": len(values),
+                "errors": errors,
+                "throughput_rps": round(len(values) / elapsed, 2),
+                **{
+                    f"p{int(fraction * 100)}_ms": None if not values else round(percentile(values, fraction) * 1000, 1)
+                    for fraction in (0.5, 0.95, 0.99)
+                },
+            }
+        return rows
+
+
+def conversation(rng):
+    topic = rng.choice(TOPICS)
+    return [
+        {"role": "user", "content": f"I need to prepare for {topic} ({rng.getrandbits(32):08x}). Help me plan it."},
+        {"role": "assistant", "content": "Sure. How much time do you have each day, and when is the deadline?"},
+        {"role": "user", "content": f"About {rng.randint(1, 4)} hours a day, for the next two weeks."},
+    ]
+
+
+async def chat(http, rng, recorder):
+    started = time.perf_counter()
+    response = await http.post("/api/chat-plan", json={"messages": conversation(rng)})
+    recorder.record("chat", time.perf_counter() - started, response.status_code == 200)
+
+
+async def stream(http, rng, recorder):
+    started = time.perf_counter()
+    first = None
+    ok = False
+    async with http.stream("POST", "/api/chat-plan/stream", json={"messages": conversation(rng)}) as response:
+        async for line in response.aiter_lines():
+            if first is None and line.startswith("data:"):
+                first = time.perf_counter() - started
+            if line.startswith("event: done"):
+                ok = True
+        ok = ok and response.status_code == 200
+    if first is not None:
+        recorder.record("stream-first", first)
+    recorder.record("stream", time.perf_counter() - started, ok)
+
+
+async def extract(http, rng, recorder):
+    start = date.today() + timedelta(days=rng.randint(0, 30))
+    body = {
+        "conversation": conversation(rng),
+        "start_date": start.isoformat(),
+        "deadline": (start + timedelta(days=13)).isoformat(),
+    }
+    started = time.perf_counter()
+    response = await http.post("/api/extract-plan", json=body)
+    recorder.record("extract", time.perf_counter() - started, response.status_code == 200)
+
+
+async def crud(http, rng, recorder, plan_ids):
+    today = date.today()
+    action = rng.randrange(4)
+    started = time.perf_counter()
+    if action == 0:
+        response = await http.get("/api/learnings", params={"limit": 50})
+    elif action == 1:
+        response = await http.get("/api/reminders", params={"date": (today + timedelta(days=rng.randint(0, 30))).isoformat()})
+    elif action == 2:
+        response = await http.post("/api/learnings", json={"date": today.isoformat(), "content": "load test"})
+    else:
+        response = await http.patch(f"/api/planning/dailyPlans/{rng.choice(plan_ids)}", json={"completed": rng.random() < 0.5})
+    recorder.record("crud", time.perf_counter() - started, response.status_code == 200)
+
+
+async def planner(http, seed, mix, deadline, recorder, plan_ids):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        try:
+            if kind == "crud":
+                await crud(http, rng, recorder, plan_ids)
+            else:
+                await {"chat": chat, "stream": stream, "extract": extract}[kind](http, rng, recorder)
+        except httpx.HTTPError:
+            recorder.record(kind, 0, ok=False)
+
+
+async def run_level(base_url, concurrency, duration, mix, plan_ids):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            planner(http, seed, mix, deadline, recorder, plan_ids) for seed in range(concurrency)
+        ])
+        return recorder.summary(time.perf_counter() - started)
+
+
+def wait_for_fake(fake_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Fake OpenAI server exited with code {process.returncode}")
+        try:
+            httpx.get(f"{fake_url}/stats", timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("Fake OpenAI server did not come up")
+
+
+def seed_plans(base_url, count=20):
+    ids = []
+    for n in range(count):
+        response = httpx.post(f"{base_url}/api/planning/dailyPlans", json={
+            "section": "morning", "content": f"seed {n}", "date": date.today().isoformat(), "completed": False,
+        })
+        response.raise_for_status()
+        ids.append(response.json()["item"]["id"])
+    return ids
+
+
+def print_level(concurrency, rows):
+    print(f"\n{concurrency} concurrent planners:")
+    print(f"  {'kind':14} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, row in rows.items():
+        cells = [f"{row[key]:9.1f}" if row[key] is not None else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"  {kind:14} {row['requests']:9} {row['errors']:7} {row['throughput_rps']:8.1f} {' '.join(cells)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,5,10,25,50", help="comma-separated numbers of virtual planners")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--mix", default="chat=2,stream=2,extract=2,crud=4", help="request kind weights")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--base-url", help="load an app that is already running instead of starting one")
+    parser.add_argument("--fake-latency-ms", type=float, default=800)
+    parser.add_argument("--fake-latency-dist", default="lognormal")
+    parser.add_argument("--fake-token-ms", type=float, default=15)
+    parser.add_argument("--fake-error-rate", type=float, default=0)
+    parser.add_argument("--p99-limit-ms", type=float, help="overall p99 that counts as falling apart")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "load_test.json"),
+                        help="where to write the results")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    processes = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        try:
+            base_url = args.base_url
+            if base_url is None:
+                fake_port, app_port = free_port(), free_port()
+                processes.append(subprocess.Popen([
+                    sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_openai.py"),
+                    "--port", str(fake_port), "--latency-ms", str(args.fake_latency_ms),
+                    "--latency-dist", args.fake_latency_dist, "--token-ms", str(args.fake_token_ms),
+                    "--error-rate", str(args.fake_error_rate),
+                ]))
+                env = dict(
+                    os.environ,
+                    DATA_DIR=data_dir,
+                    STORAGE_BACKEND=args.backend,
+                    OPENAI_API_KEY="fake",
+                    OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+                )
+                processes.append(subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+                     "--workers", str(args.workers), "--log-level", "warning"],
+                    cwd=BACKEND_DIR, env=env,
+                ))
+                base_url = f"http://127.0.0.1:{app_port}"
+                wait_for_fake(f"http://127.0.0.1:{fake_port}", processes[0])
+                wait_until_up(base_url, processes[-1])
+            plan_ids = seed_plans(base_url)
+
+            results = []
+            for concurrency in levels:
+                rows = asyncio.run(run_level(base_url, concurrency, args.duration, mix, plan_ids))
+                print_level(concurrency, rows)
+                results.append({"concurrency": concurrency, "kinds": rows})
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                process.wait()
+
+    limit = args.p99_limit_ms
+    if limit is None and results and results[0]["kinds"]["all"]["p99_ms"] is not None:
+        limit = 2 * results[0]["kinds"]["all"]["p99_ms"]
+    # The knee: the highest level before the first one that broke the limit
+    knee = None
+    for result in results:
+        p99 = result["kinds"]["all"]["p99_ms"]
+        if limit is None or p99 is None or p99 > limit:
+            break
+        knee = result["concurrency"]
+    if limit is not None:
+        print(f"\nOverall p99 stays under {limit:.0f} ms up to {knee or 'none'} concurrent planners")
+
+    report = {
+        "mix": mix,
+        "duration_s": args.duration,
+        "workers": args.workers,
+        "backend": args.backend,
+        "fake": None if args.base_url else {
+            "latency_ms": args.fake_latency_ms,
+            "latency_dist": args.fake_latency_dist,
+            "token_ms": args.fake_token_ms,
+            "error_rate": args.fake_error_rate,
+        },
+        "p99_limit_ms": limit,
+        "max_concurrency_within_limit": knee,
+        "levels": results,
+    }
+    write_report(args.output, report)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
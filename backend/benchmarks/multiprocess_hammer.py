@@ -0,0 +1,148 @@
+"""
+Hammer the API from several client processes against a multi-worker server
+and check that no write was lost.
+
+Starts `uvicorn main:app --workers N` on a throwaway data directory, then
+each client process adds learnings, toggles review dates on one shared
+learning and sets fields on one shared plan. Every write targets a distinct
+date or field, so afterwards the totals must match exactly. Exits non-zero
+if anything went missing.
+
+    cd backend
+    python benchmarks/multiprocess_hammer.py --workers 4 --clients 8 --iterations 50
+    python benchmarks/multiprocess_hammer.py --backend sqlite
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            httpx.get(f"{base_url}/api/learnings", timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not come up")
+
+
+def review_date(client_index, iteration, iterations):
+    # A distinct date per (client, iteration)
+    return (date(2030, 1, 1) + timedelta(days=client_index * iterations + iteration)).isoformat()
+
+
+def client(base_url, client_index, iterations, learning_id, plan_id, failures):
+    with httpx.Client(base_url=base_url, timeout=30) as http:
+        for i in range(iterations):
+            requests = [
+                ("POST", "/api/learnings", {"json": {"date": "2030-01-01", "content": f"c{client_index}-{i}"}}),
+                ("PATCH", f"/api/learnings/{learning_id}",
+                 {"params": {"completed": True, "date": review_date(client_index, i, iterations)}}),
+                ("PATCH", f"/api/planning/dailyPlans/{plan_id}", {"json": {f"f{client_index}_{i}": i}}),
+            ]
+            for method, path, kwargs in requests:
+                response = http.request(method, path, **kwargs)
+                if response.status_code != 200:
+                    failures.put(f"{method} {path}: {response.status_code} {response.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--clients", type=int, default=8, help="client processes")
+    parser.add_argument("--iterations", type=int, default=25, help="rounds of writes per client")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--journal", action="store_true", help="set PLANNING_JOURNAL=1 (json backend)")
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(
+            os.environ,
+            DATA_DIR=data_dir,
+            STORAGE_BACKEND=args.backend,
+            PLANNING_JOURNAL="1" if args.journal else "",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            wait_until_up(base_url, server)
+            learning_id = httpx.post(
+                f"{base_url}/api/learnings", json={"date": "2030-01-01", "content": "shared"}
+            ).json()["id"]
+            plan_id = httpx.post(
+                f"{base_url}/api/planning/dailyPlans",
+                json={"title": "shared", "date": "2030-01-01", "completed": False},
+            ).json()["item"]["id"]
+
+            failures = multiprocessing.Queue()
+            started = time.perf_counter()
+            processes = [
+                multiprocessing.Process(
+                    target=client, args=(base_url, n, args.iterations, learning_id, plan_id, failures)
+                )
+                for n in range(args.clients)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+
+            learnings = httpx.get(f"{base_url}/api/learnings").json()
+            plans = httpx.get(f"{base_url}/api/planning/dailyPlans").json()["dailyPlans"]
+        finally:
+            server.terminate()
+            server.wait()
+
+    writes = args.clients * args.iterations
+    shared = next(item for item in learnings if item["id"] == learning_id)
+    plan = next(item for item in plans if item["id"] == plan_id)
+    checks = {
+        "learnings added": (len(learnings) - 1, writes),
+        "distinct learning ids": (len({item["id"] for item in learnings}), writes + 1),
+        "review dates recorded": (len(shared.get("completed_dates") or []), writes),
+        "plan fields recorded": (sum(1 for key in plan if key.startswith("f")), writes),
+    }
+
+    errors = []
+    while not failures.empty():
+        errors.append(failures.get())
+    print(f"{args.backend}{' + journal' if args.journal else ''}, {args.workers} workers, "
+          f"{args.clients} clients: {writes * 3} writes in {elapsed:.2f}s ({writes * 3 / elapsed:.0f}/s)")
+    ok = not errors
+    for name, (got, expected) in checks.items():
+        status = "ok" if got == expected else "LOST"
+        ok = ok and got == expected
+        print(f"  {name:24} {got}/{expected} {status}")
+    for error in errors[:10]:
+        print(f"  failed request: {error}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
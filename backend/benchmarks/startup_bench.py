@@ -0,0 +1,174 @@
+"""
+Measure how long the app takes to start serving.
+
+For each data set size, writes a throwaway data directory (the same synthetic
+data as storage_bench.py) and, --runs times:
+
+- import: a fresh interpreter timing `import main`;
+- first response: `uvicorn main:app` is started and the first page of
+  GET /api/learnings polled every few milliseconds; the time from launching
+  the process to the first 200 is what a restart (or every --reload) costs
+  before the UI works again. A page rather than the whole list, so large data
+  sets measure reading the data rather than serializing all of it.
+
+Results go to a JSON file in benchmarks/results/ with the median, min and
+max of each, plus the git commit and machine. --compare prints the change
+against an earlier file and exits non-zero if the median first response got
+slower than --threshold; --max-ms fails the run outright above a fixed budget.
+
+    cd backend
+    python benchmarks/startup_bench.py --output benchmarks/results/before.json
+    python benchmarks/startup_bench.py --compare benchmarks/results/before.json
+    python benchmarks/startup_bench.py --sizes 0,100k --backend sqlite --max-ms 1500
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from multiprocess_hammer import free_port
+from storage_bench import BACKEND_DIR, RESULTS_DIR, git_commit, parse_size, write_data, write_report
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def time_import(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def time_first_response(env, timeout=60):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/learnings?limit=50"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                try:
+                    client.get(url).raise_for_status()
+                    return (time.perf_counter() - started) * 1000
+                except httpx.TransportError:
+                    time.sleep(0.005)
+        raise RuntimeError("Server did not come up")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(timings):
+    return {
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print median first-response changes against an earlier results file. Returns the regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["backend"], r["size"])
+    before = {key(r): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        old_ms, new_ms = old["first_response"]["median_ms"], result["first_response"]["median_ms"]
+        ratio = new_ms / old_ms
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(result)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"  {result['backend']:8} {result['size']:>8} first response "
+              f"{old_ms:10.1f} -> {new_ms:10.1f} ms ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="0,10k,100k", help="comma-separated item counts, e.g. 0,10k,1m")
+    parser.add_argument("--backend", action="append", choices=["json", "sqlite"],
+                        help="storage backend; repeat for several (default json)")
+    parser.add_argument("--runs", type=int, default=5, help="starts per backend and size")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "startup_bench.json"),
+                        help="where to write the results")
+    parser.add_argument("--compare", metavar="FILE", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="with --compare, median ratio above which a start counts as slower")
+    parser.add_argument("--max-ms", type=float, help="fail if any median first response takes longer than this")
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backend or ["json"]:
+        for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+            imports, firsts = [], []
+            with tempfile.TemporaryDirectory() as data_dir:
+                write_data(data_dir, size, "json", args.seed)
+                env = dict(os.environ, DATA_DIR=data_dir, STORAGE_BACKEND=backend)
+                if backend == "sqlite":
+                    # Leave the one-off JSON import out of the timings
+                    time_first_response(env)
+                for _ in range(args.runs):
+                    imports.append(time_import(env))
+                    firsts.append(time_first_response(env))
+            result = {
+                "backend": backend,
+                "size": size,
+                "runs": args.runs,
+                "import": summarize(imports),
+                "first_response": summarize(firsts),
+            }
+            results.append(result)
+            print(f"{backend:8} {size:>8} items: import {result['import']['median_ms']:8.1f} ms, "
+                  f"first response {result['first_response']['median_ms']:8.1f} ms (median of {args.runs})",
+                  file=sys.stderr)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    write_report(args.output, report)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    failed = False
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} starts slower than {args.threshold}x", file=sys.stderr)
+            failed = True
+    if args.max_ms is not None:
+        over = [r for r in results if r["first_response"]["median_ms"] > args.max_ms]
+        for result in over:
+            print(f"{result['backend']} {result['size']}: first response {result['first_response']['median_ms']} ms "
+                  f"is over {args.max_ms:g} ms", file=sys.stderr)
+        failed = failed or bool(over)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
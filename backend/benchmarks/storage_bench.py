@@ -0,0 +1,322 @@
+"""
+Time every storage-backed API route against synthetic data sets.
+
+For each backend and size, writes a throwaway data directory holding `size`
+learnings and `size` plan items, then drives the routes in main.py through
+the FastAPI TestClient: reads (full lists, pages, reminders, schedule) and
+writes (add, edit, toggle, delete, batch, full replace). Each size runs in
+its own process because main.py opens the store at import time.
+
+Results go to a JSON file in benchmarks/results/ (one record per
+backend/size/operation with p50/p95/mean in milliseconds, plus the git commit
+and machine) so runs can be compared; --compare prints the change against an earlier file and exits
+non-zero if anything got slower than --threshold.
+
+    cd backend
+    python benchmarks/storage_bench.py --sizes 1k,10k --output benchmarks/results/before.json
+    python benchmarks/storage_bench.py --sizes 1k,10k --compare benchmarks/results/before.json
+    python benchmarks/storage_bench.py --backend json --backend sqlite --sizes 100k,1m
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# Ignored by git, so runs don't leave results in the working tree
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+PLAN_TYPES = ["dailyPlans", "weeklyPlans", "monthlyPlans", "yearlyPlans"]
+SECTIONS = ["morning", "afternoon", "evening"]
+FIRST_DATE = date(2024, 1, 1)
+DAYS = 730  # Synthetic dates fall in the two years from FIRST_DATE
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def day(offset):
+    return (FIRST_DATE + timedelta(days=offset)).isoformat()
+
+
+def synthetic_learnings(size, rng):
+    import scheduler
+
+    learnings = []
+    for n in range(size):
+        learned = day(rng.randrange(DAYS))
+        recaps = scheduler.recap_dates(learned)
+        learnings.append({
+            "id": str(n + 1),
+            "date": learned,
+            "content": f"Learning {n + 1}: " + " ".join(rng.choices(["alpha", "beta", "gamma", "delta"], k=8)),
+            "completed": False,
+            "completed_dates": [d for d in recaps if rng.random() < 0.5],
+            "recap_dates": recaps,
+        })
+    return learnings
+
+
+def synthetic_planning(size, rng, default):
+    planning = default
+    for n in range(size):
+        plan_type = PLAN_TYPES[0] if n % 4 else PLAN_TYPES[n // 4 % len(PLAN_TYPES)]
+        planning[plan_type].append({
+            "id": f"p{n + 1}",
+            "section": rng.choice(SECTIONS),
+            "content": f"Task {n + 1}",
+            "date": day(rng.randrange(DAYS)),
+            "completed": rng.random() < 0.3,
+            "groupId": None,
+        })
+    return planning
+
+
+def write_data(data_dir, size, fmt, seed):
+    """
+    Write the synthetic data set where main.py will look for it. The SQLite
+    backend copies it into a new database when main.py opens the store.
+    """
+    import serialization
+
+    rng = random.Random(seed)
+    default = {name: [] for name in PLAN_TYPES + ["taskGroups", "monthlyTaskGroups", "yearlyTaskGroups"]}
+    with open(os.path.join(data_dir, "learning_data.json"), "wb") as f:
+        f.write(serialization.dumps(synthetic_learnings(size, rng), fmt))
+    with open(os.path.join(data_dir, "planning_data.json"), "wb") as f:
+        f.write(serialization.dumps(synthetic_planning(size, rng, default), fmt))
+
+
+class Timer:
+    """Runs an operation up to `repeat` times or until `budget` seconds are spent (at least once)."""
+
+    def __init__(self, repeat, budget):
+        self.repeat = repeat
+        self.budget = budget
+        self.results = []
+
+    def run(self, name, call, size, repeat=None):
+        timings = []
+        spent = 0.0
+        for n in range(min(self.repeat, repeat or self.repeat)):
+            started = time.perf_counter()
+            response = call(n)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: {response.status_code} {response.text[:200]}")
+            timings.append(elapsed * 1000)
+            spent += elapsed
+            if spent > self.budget:
+                break
+        timings.sort()
+        self.results.append({
+            "operation": name,
+            "size": size,
+            "runs": len(timings),
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            "min_ms": round(timings[0], 3),
+        })
+        print(f"  {name:34} {self.results[-1]['p50_ms']:10.2f} ms p50 ({len(timings)} runs)", file=sys.stderr)
+
+
+def run_size(size, repeat, budget):
+    """Time every route against the data already in DATA_DIR (child process)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    rng = random.Random(1)
+    timer = Timer(repeat, budget)
+
+    def some_learning():
+        return str(rng.randrange(size) + 1)
+
+    def some_plan():
+        # Every item not divisible by 4 is a daily plan
+        n = rng.randrange(size)
+        return f"p{n - n % 4 + 2}" if size > 2 else "p2"
+
+    def some_date():
+        return day(rng.randrange(DAYS))
+
+    added_learnings, added_plans = [], []
+    with TestClient(main.app) as client:
+        # Reads
+        timer.run("GET /api/learnings", lambda n: client.get("/api/learnings"), size)
+        timer.run("GET /api/learnings?limit=50", lambda n: client.get(
+            "/api/learnings", params={"from": some_date(), "limit": 50}), size)
+        timer.run("GET /api/reminders?date", lambda n: client.get("/api/reminders", params={"date": some_date()}), size)
+        timer.run("GET /api/reminders?start&end (7d)", lambda n: client.get(
+            "/api/reminders", params={"start": day(n % DAYS), "end": day(n % DAYS + 6)}), size)
+        timer.run("GET /api/schedule?horizon=90", lambda n: client.get(
+            "/api/schedule", params={"start": some_date(), "horizon": 90, "items": "false"}), size)
+        timer.run("GET /api/planning", lambda n: client.get("/api/planning"), size)
+        timer.run("GET /api/planning/dailyPlans", lambda n: client.get("/api/planning/dailyPlans"), size)
+        timer.run("GET /api/planning/dailyPlans?limit=50", lambda n: client.get(
+            "/api/planning/dailyPlans", params={"from": some_date(), "limit": 50}), size)
+
+        # Learning writes
+        def add_learning(n):
+            response = client.post("/api/learnings", json={"date": some_date(), "content": f"bench {n}"})
+            added_learnings.append(response.json()["id"])
+            return response
+
+        timer.run("POST /api/learnings", add_learning, size)
+        timer.run("PATCH /api/learnings/{id}", lambda n: client.patch(
+            f"/api/learnings/{some_learning()}", params={"completed": n % 2 == 0, "date": some_date()}), size)
+        timer.run("PUT /api/learnings/{id}", lambda n: client.put(
+            f"/api/learnings/{some_learning()}", json={"date": "2024-01-01", "content": f"edited {n}"}), size)
+        timer.run("DELETE /api/learnings/{id}", lambda n: client.delete(
+            f"/api/learnings/{added_learnings.pop()}"), size, repeat=len(added_learnings))
+
+        # Planning writes
+        def add_plan(n):
+            response = client.post("/api/planning/dailyPlans", json={
+                "section": "morning", "content": f"bench {n}", "date": some_date(), "completed": False,
+            })
+            added_plans.append(response.json()["item"]["id"])
+            return response
+
+        timer.run("POST /api/planning/dailyPlans", add_plan, size)
+        timer.run("PATCH /api/planning/dailyPlans/{id}", lambda n: client.patch(
+            f"/api/planning/dailyPlans/{some_plan()}", json={"completed": n % 2 == 0}), size)
+        timer.run("POST /api/planning/batch (10 ops)", lambda n: client.post("/api/planning/batch", json={
+            "operations": [
+                {"op": "update", "type": "dailyPlans", "id": some_plan(), "updates": {"completed": True}}
+                for _ in range(10)
+            ],
+        }), size)
+        timer.run("DELETE /api/planning/dailyPlans/{id}", lambda n: client.delete(
+            f"/api/planning/dailyPlans/{added_plans.pop()}"), size, repeat=len(added_plans))
+
+        # Whole-document writes, with the data that's already there
+        weekly = client.get("/api/planning/weeklyPlans").json()["weeklyPlans"]
+        timer.run("PUT /api/planning/weeklyPlans", lambda n: client.put("/api/planning/weeklyPlans", json=weekly), size)
+        planning = client.get("/api/planning").json()
+        timer.run("PUT /api/planning", lambda n: client.put("/api/planning", json=planning), size)
+        if main.scheduler.numpy_available():
+            timer.run("POST /api/learnings/reschedule", lambda n: client.post(
+                "/api/learnings/reschedule", params={"today": day(DAYS + n)}), size)
+    return timer.results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, report):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50 changes against an earlier results file. Returns the regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["backend"], r["size"], r["operation"])
+    before = {key(r): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+    for result in results:
+        old = before.get(key(result))
+        if old is None or not old["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(result)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"  {result['backend']:8} {result['size']:>8} {result['operation']:34} "
+              f"{old['p50_ms']:10.2f} -> {result['p50_ms']:10.2f} ms ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k,100k,1m", help="comma-separated item counts, e.g. 1k,10k,1m")
+    parser.add_argument("--backend", action="append", choices=["json", "sqlite"],
+                        help="storage backend; repeat for several (default json)")
+    parser.add_argument("--journal", action="store_true", help="set PLANNING_JOURNAL=1 (json backend)")
+    parser.add_argument("--format", default="json", help="STORAGE_FORMAT for the json backend")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per operation")
+    parser.add_argument("--budget", type=float, default=5.0, help="stop repeating an operation after this many seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "storage_bench.json"),
+                        help="where to write the results")
+    parser.add_argument("--compare", metavar="FILE", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="with --compare, p50 ratio above which an operation counts as slower")
+    parser.add_argument("--run-one", type=int, metavar="SIZE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        # Child process: DATA_DIR and STORAGE_* are already set
+        write_data(os.environ["DATA_DIR"], args.run_one, args.format, args.seed)
+        json.dump(run_size(args.run_one, args.repeat, args.budget), sys.stdout)
+        return
+
+    results = []
+    for backend in args.backend or ["json"]:
+        for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+            print(f"{backend}, {size} items:", file=sys.stderr)
+            with tempfile.TemporaryDirectory() as data_dir:
+                env = dict(
+                    os.environ,
+                    DATA_DIR=data_dir,
+                    STORAGE_BACKEND=backend,
+                    STORAGE_FORMAT=args.format,
+                    PLANNING_JOURNAL="1" if args.journal else "",
+                )
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--run-one", str(size), "--format", args.format,
+                     "--repeat", str(args.repeat), "--budget", str(args.budget), "--seed", str(args.seed)],
+                    cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, check=True,
+                )
+            for result in json.loads(child.stdout):
+                results.append({"backend": backend + ("+journal" if args.journal and backend == "json" else ""),
+                                **result})
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "format": args.format,
+        "repeat": args.repeat,
+        "budget_s": args.budget,
+        "results": results,
+    }
+    write_report(args.output, report)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} operations slower than {args.threshold}x", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
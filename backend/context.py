@@ -0,0 +1,146 @@
+"""
+Conversation compaction for the AI endpoints.
+
+Long planning sessions resend the whole chat history on every turn. Before a
+conversation goes into a prompt it is measured against a per-endpoint token
+budget; if it's over, the most recent turns are kept verbatim and everything
+before them is replaced by a summary. Summaries are cached by the exact
+messages they cover and built incrementally: when a conversation grows, only
+the turns that newly fell out of the verbatim window are folded into the
+previous summary.
+
+Token counts use tiktoken when it is installed and fall back to a
+characters-per-token estimate otherwise.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Rough tokens added by the chat format around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # Not installed, or the encoding can't be fetched offline
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages):
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def parse_budgets(spec, default):
+    """Parse "chat-plan=3000,extract-plan=6000" into a dict; `default` covers other endpoints."""
+    budgets = {"default": default}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            budgets[name.strip()] = int(value)
+    return budgets
+
+
+class ContextCompactor:
+    """
+    summarize is an async callable (previous_summary, messages) -> str, where
+    previous_summary may be None and messages are {role, content} dicts.
+    """
+
+    def __init__(self, summarize, budgets, keep_recent=4, summary_reserve=500, cache_size=512):
+        self.summarize = summarize
+        self.budgets = budgets
+        self.keep_recent = keep_recent  # Turns always kept verbatim
+        self.summary_reserve = summary_reserve  # Tokens set aside for the summary itself
+        self.cache_size = cache_size
+        self._summaries = OrderedDict()  # digest of summarized prefix -> (prefix length, summary)
+
+    def budget_for(self, endpoint):
+        return self.budgets.get(endpoint, self.budgets["default"])
+
+    async def compact(self, endpoint, messages):
+        """
+        Return messages unchanged if they fit the endpoint's budget; otherwise
+        a summary message followed by the most recent turns.
+        """
+        budget = self.budget_for(endpoint)
+        if count_message_tokens(messages) <= budget:
+            return messages
+
+        # Keep as many recent turns verbatim as fit next to the summary, but at least keep_recent
+        available = budget - self.summary_reserve
+        split = len(messages)
+        used = 0
+        while split > 0:
+            cost = count_message_tokens([messages[split - 1]])
+            if len(messages) - split >= self.keep_recent and used + cost > available:
+                break
+            used += cost
+            split -= 1
+        if split == 0:
+            return messages
+
+        try:
+            summary = await self._summary_for(messages[:split])
+        except Exception as e:
+            # Sending the full history is slower but still correct
+            print(f"Conversation summary failed, sending full history: {e}")
+            return messages
+
+        summary_message = {
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {summary}",
+        }
+        return [summary_message] + list(messages[split:])
+
+    async def _summary_for(self, prefix):
+        digests = self._prefix_digests(prefix)
+        cached = self._summaries.get(digests[-1])
+        if cached is not None:
+            self._summaries.move_to_end(digests[-1])
+            return cached[1]
+
+        # Reuse the longest already-summarized prefix and only fold in what's new
+        previous_summary, start = None, 0
+        for length in range(len(prefix) - 1, 0, -1):
+            entry = self._summaries.get(digests[length - 1])
+            if entry is not None:
+                previous_summary, start = entry[1], length
+                break
+
+        summary = await self.summarize(previous_summary, prefix[start:])
+        self._summaries[digests[-1]] = (len(prefix), summary)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+        return summary
+
+    @staticmethod
+    def _prefix_digests(messages):
+        """digests[i] identifies messages[:i + 1]"""
+        digests = []
+        h = hashlib.sha256()
+        for message in messages:
+            h.update(json.dumps([message["role"], message["content"]]).encode("utf-8"))
+            digests.append(h.copy().hexdigest())
+        return digests
@@ -0,0 +1,156 @@
+"""
+Response cache for the /api/extract-* endpoints.
+
+Extraction runs at a low temperature, and users often click "generate" again
+on the same conversation, so results are cached by a hash of everything that
+goes into the prompt. Entries live in a bounded in-memory LRU with a TTL, and
+optionally in a directory of JSON files that survives restarts. The async
+endpoints use get_async/set_async, which do the disk tier's file I/O in a
+worker thread instead of on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(endpoint, model, conversation, start_date, deadline):
+    """Stable hash of an extraction request. conversation is a list of {role, content} dicts."""
+    payload = json.dumps(
+        {
+            "endpoint": endpoint,
+            "model": model,
+            "conversation": conversation,
+            "start_date": start_date,
+            "deadline": deadline,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, max_entries=256, ttl_seconds=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _is_fresh(self, created_at):
+        return time.time() - created_at < self.ttl_seconds
+
+    def _remember(self, key, created_at, value):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_memory(self, key):
+        """The in-memory entry, or None; counts a hit, and a miss when there is no disk tier."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            if not self.disk_dir:
+                self.misses += 1
+            return None
+
+    def _get_disk(self, key):
+        # The file is read outside the lock so memory lookups never wait on disk
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, entry["created_at"], entry["value"])
+            self.hits += 1
+            self.disk_hits += 1
+            return entry["value"]
+
+    def get(self, key):
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            value = self._get_disk(key)
+        return value
+
+    async def get_async(self, key):
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            value = await asyncio.to_thread(self._get_disk, key)
+        return value
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not self._is_fresh(entry.get("created_at", 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key, created_at, value):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        # Per-process and per-thread temp name; several workers may share the directory
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"created_at": created_at, "value": value}, f)
+        os.replace(tmp_path, self._disk_path(key))
+
+    def _set_memory(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+        return created_at
+
+    def set(self, key, value):
+        created_at = self._set_memory(key, value)
+        if self.disk_dir:
+            self._write_disk(key, created_at, value)
+
+    async def set_async(self, key, value):
+        created_at = self._set_memory(key, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, created_at, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.disk_dir and os.path.isdir(self.disk_dir):
+                for name in os.listdir(self.disk_dir):
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk": bool(self.disk_dir),
+            }
@@ -0,0 +1,141 @@
+"""
+Background jobs for the AI extraction endpoints.
+
+JobQueue runs submitted coroutines on a bounded number of workers and keeps
+their results around for a while, so a client can submit an extraction, get a
+job id back right away and poll (or long-poll) for the result. Jobs run
+independently of the HTTP request that created them, so a client that
+disconnects doesn't waste the tokens already being spent.
+
+SingleFlight collapses identical concurrent calls into one: the first caller
+runs the work, later callers with the same key await the same result.
+"""
+import asyncio
+import time
+import uuid
+
+from fastapi import HTTPException
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Future
+
+    async def do(self, key, func):
+        """Run `await func()` once per key at a time; concurrent callers share the result."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller going away doesn't cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+class Job:
+    def __init__(self, key, kind):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=4, result_ttl=600):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl  # Seconds a finished job stays queryable
+        self._jobs = {}  # id -> Job
+        self._inflight = {}  # key -> Job, for jobs not yet finished
+        self._slots = None
+
+    def submit(self, key, kind, func):
+        """
+        Start `await func()` as a job and return it. If an identical job (same
+        key) is still queued or running, that job is returned instead.
+        """
+        self._prune()
+        job = self._inflight.get(key)
+        if job is not None:
+            return job
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        job = Job(key, kind)
+        self._jobs[job.id] = job
+        self._inflight[key] = job
+        job.task = asyncio.ensure_future(self._run(job, func))
+        return job
+
+    async def _run(self, job, func):
+        async with self._slots:
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                result = await func()
+                job.result = result.dict() if hasattr(result, "dict") else result
+                job.status = "done"
+            except HTTPException as e:
+                job.error = {"status_code": e.status_code, "detail": e.detail}
+                job.status = "failed"
+            except Exception as e:
+                job.error = {"status_code": 500, "detail": str(e)}
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._inflight.pop(job.key, None)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def wait(self, job, timeout):
+        """Wait up to `timeout` seconds for a job to finish; returns the job either way."""
+        if not job.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(job.task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self):
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"max_workers": self.max_workers, **counts}
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def shutdown(self):
+        tasks = [job.task for job in self._inflight.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,70 @@
+"""
+Incremental parsing of a JSON document that arrives in pieces.
+
+ArrayItemParser picks the items of one top-level array out of a streamed
+object such as {"plans": [{...}, {...}]}: feed() it text as it arrives and it
+returns each item as soon as the item's closing bracket has been seen. The
+text is scanned once, character by character, tracking only string/escape
+state and nesting depth; each finished item is parsed on its own with the
+json module.
+"""
+import json
+
+
+class ArrayItemParser:
+    def __init__(self, key):
+        self.key = key
+        self.text = []  # Everything fed so far, for parsing the whole document at the end
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string = []  # The string being read at depth 1, a candidate key
+        self._last_key = None  # Last string completed at depth 1
+        self._in_array = False  # Inside the array under `key`
+        self._item = None  # Pieces of the item being read, or None between items
+
+    def feed(self, chunk):
+        """Add text; return the array items completed by it."""
+        self.text.append(chunk)
+        items = []
+        start = 0  # Where the current item's text begins within chunk
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = "".join(self._string)
+                if self._depth == 1 and self._in_string:
+                    self._string.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string = []
+            elif char in "{[":
+                if self._in_array and self._depth == 2:
+                    self._item = []
+                    start = i
+                if char == "[" and self._depth == 1 and self._last_key == self.key:
+                    self._in_array = True
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and self._item is not None:
+                    self._item.append(chunk[start:i + 1])
+                    items.append(json.loads("".join(self._item)))
+                    self._item = None
+                elif self._in_array and self._depth == 1:
+                    self._in_array = False
+        if self._item is not None:
+            self._item.append(chunk[start:])
+        return items
+
+    def document(self):
+        """Parse everything fed so far as one JSON document (raises ValueError if incomplete)."""
+        return json.loads("".join(self.text))
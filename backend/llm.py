@@ -0,0 +1,324 @@
+"""
+Shared OpenAI client for the AI endpoints.
+
+One AsyncOpenAI client is created on first use and reused for the lifetime of
+the app, so requests share a keep-alive connection pool and never block the
+event loop while waiting on the API. The openai package itself is only
+imported then too: it takes about half a second, which app startup (and every
+--reload) would otherwise pay even if no AI endpoint is ever called. Calls made through
+create_chat_completion() are timed and their token usage counted in /metrics.
+
+create_chat_completion() also keeps one slow or failing upstream call from
+setting the user's latency:
+
+- Deadline: each endpoint gets a time budget (OPENAI_DEADLINE, overridden per
+  endpoint by OPENAI_DEADLINES) covering all attempts; past it the call fails
+  with DeadlineExceededError. For streams the budget covers opening the
+  stream, not reading it.
+- Retries: connection errors, timeouts, 408/409/429 and 5xx answers are
+  retried up to OPENAI_RETRIES times after a jittered exponential backoff
+  (or the server's Retry-After), as long as the wait fits in the deadline.
+  The SDK's own retries are turned off so the two don't multiply.
+- Hedging (OPENAI_HEDGE=1, non-streaming calls only): if an attempt is still
+  running after the endpoint's observed p95 latency, a second identical
+  request is sent and whichever answers first is used. The other is
+  cancelled. This costs at most ~5% extra requests.
+- Circuit breaker: after OPENAI_BREAKER_THRESHOLD retryable failures in a
+  row, calls fail straight away with CircuitOpenError for
+  OPENAI_BREAKER_COOLDOWN seconds; then one call is let through to see
+  whether the API has recovered.
+"""
+import asyncio
+import collections
+import os
+import random
+import time
+
+import metrics
+
+# Connection pool and timeout settings (seconds)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+# Another OpenAI-compatible endpoint, e.g. benchmarks/fake_openai.py for load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Per-call time budget in seconds, across retries; OPENAI_DEADLINES overrides
+# it per endpoint, e.g. "/api/chat-plan=20,summarize=15"
+OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "60"))
+DEADLINES = {"/api/chat-plan": 30.0, "/api/chat-plan/stream": 30.0, "summarize": 20.0}
+for _item in filter(None, os.getenv("OPENAI_DEADLINES", "").split(",")):
+    _endpoint, _, _seconds = _item.partition("=")
+    DEADLINES[_endpoint.strip()] = float(_seconds)
+# Extra attempts after a retryable error, and the backoff before them (seconds)
+OPENAI_RETRIES = int(os.getenv("OPENAI_RETRIES", "2"))
+OPENAI_BACKOFF = float(os.getenv("OPENAI_BACKOFF", "0.5"))
+OPENAI_MAX_BACKOFF = float(os.getenv("OPENAI_MAX_BACKOFF", "8"))
+# Hedged requests: off by default since they can double the cost of slow calls
+OPENAI_HEDGE = os.getenv("OPENAI_HEDGE", "").lower() in ("1", "true", "yes")
+OPENAI_HEDGE_QUANTILE = float(os.getenv("OPENAI_HEDGE_QUANTILE", "0.95"))
+OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", "20"))
+# Circuit breaker; a threshold of 0 turns it off
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))
+
+_client = None
+
+REQUEST_SECONDS = metrics.histogram(
+    "openai_request_duration_seconds",
+    "Time until the OpenAI API answered (for streams, until the stream opened)",
+    ["endpoint", "model", "outcome"],
+)
+TOKENS = metrics.counter("openai_tokens_total", "Tokens reported in response.usage", ["endpoint", "model", "kind"])
+RETRIES = metrics.counter("openai_retries_total", "Attempts repeated after a retryable error", ["endpoint"])
+HEDGES = metrics.counter(
+    "openai_hedges_total",
+    "Second requests sent because the first was slower than the hedge delay, by which one answered first",
+    ["endpoint", "winner"],
+)
+REJECTED = metrics.counter("openai_rejected_total", "Calls refused while the circuit breaker was open", ["endpoint"])
+BREAKER_OPENED = metrics.counter("openai_breaker_opened_total", "Times the circuit breaker opened")
+
+
+class DeadlineExceededError(TimeoutError):
+    """The endpoint's time budget ran out before the API answered."""
+
+
+class CircuitOpenError(Exception):
+    """The API has been failing, so calls are refused without trying it."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` failures in a row and refuses calls for `cooldown`
+    seconds. After that one trial call is let through: success closes the
+    breaker, failure opens it again. Only used from the event loop.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        if self.opened_at is None:
+            return
+        waited = time.monotonic() - self.opened_at
+        if waited < self.cooldown or self._trial:
+            retry_in = max(0, round(self.cooldown - waited))
+            raise CircuitOpenError(f"OpenAI API unavailable after repeated failures; retry in {retry_in}s")
+        self._trial = True
+
+    def record(self, ok):
+        """Outcome of an allowed call: True, False (a retryable failure) or None (no verdict, e.g. cancelled or a 4xx)."""
+        if ok is None:
+            self._trial = False
+        elif ok:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+        else:
+            self.failures += 1
+            if self.threshold and (self._trial or (self.opened_at is None and self.failures >= self.threshold)):
+                self.opened_at = time.monotonic()
+                self._trial = False
+                BREAKER_OPENED.inc()
+
+
+class LatencyWindow:
+    """Durations of recent successful calls per endpoint, for the hedge delay."""
+
+    def __init__(self, size=200):
+        self.size = size
+        self._samples = {}  # endpoint -> deque of seconds
+
+    def add(self, endpoint, seconds):
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = collections.deque(maxlen=self.size)
+        samples.append(seconds)
+
+    def quantile(self, endpoint, q, min_samples=1):
+        """The q-quantile of the endpoint's recent latencies, or None with fewer than min_samples."""
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+breaker = CircuitBreaker(OPENAI_BREAKER_THRESHOLD, OPENAI_BREAKER_COOLDOWN)
+latencies = LatencyWindow()
+
+
+def get_client():
+    """Return the shared AsyncOpenAI client, or None if OPENAI_API_KEY is not set."""
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        )
+        # Retries are done (and bounded by the deadline) in create_chat_completion
+        _client = AsyncOpenAI(api_key=api_key, base_url=OPENAI_BASE_URL, http_client=http_client, max_retries=0)
+    return _client
+
+
+def preload():
+    """Import the openai package ahead of the first get_client(); meant for a background thread at startup."""
+    import openai  # noqa: F401
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def create_chat_completion(client, endpoint, **kwargs):
+    """
+    client.chat.completions.create(**kwargs), recorded under `endpoint`, with
+    the endpoint's deadline, retries, hedging and the circuit breaker (see the
+    module docstring). Streams are timed until they open; pass their final
+    chunk's usage to record_usage() (request it with
+    stream_options={"include_usage": True}).
+    """
+    model = kwargs.get("model") or ""
+    budget = DEADLINES.get(endpoint, OPENAI_DEADLINE)
+    deadline = time.monotonic() + budget
+    hedge = OPENAI_HEDGE and not kwargs.get("stream")
+    attempt = 0
+    while True:
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            REJECTED.inc(endpoint)
+            raise
+        verdict = None
+        try:
+            timeout = deadline - time.monotonic()
+            if hedge:
+                response = await _hedged(client, endpoint, model, kwargs, timeout)
+            else:
+                response = await asyncio.wait_for(_attempt(client, endpoint, model, kwargs), timeout)
+            verdict = True
+            break
+        except Exception as e:
+            retryable = is_retryable(e)
+            # A 4xx answer says nothing about the API's health, so only retryable errors count against it
+            verdict = False if retryable else None
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceededError(f"No answer from the OpenAI API within {budget:g}s") from e
+            delay = _backoff(attempt, e)
+            if not retryable or attempt >= OPENAI_RETRIES or time.monotonic() + delay >= deadline:
+                raise
+        finally:
+            breaker.record(verdict)
+        attempt += 1
+        RETRIES.inc(endpoint)
+        await asyncio.sleep(delay)
+    if not kwargs.get("stream"):
+        record_usage(endpoint, model, response.usage)
+    return response
+
+
+def is_retryable(error):
+    """Whether another attempt could succeed: network errors, timeouts, 408/409/429 and 5xx."""
+    import openai  # Already imported by whoever made the client
+
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _backoff(attempt, error):
+    """Seconds to wait before retrying: full jitter, or the server's Retry-After if it asks for longer."""
+    delay = random.uniform(0, min(OPENAI_MAX_BACKOFF, OPENAI_BACKOFF * 2 ** attempt))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+async def _attempt(client, endpoint, model, kwargs):
+    """One API request, timed into REQUEST_SECONDS (and the hedge window when it succeeds)."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await client.chat.completions.create(**kwargs)
+        outcome = "ok"
+        return response
+    except asyncio.CancelledError:
+        # Past the deadline, or the slower half of a hedged pair
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, endpoint, model, outcome)
+        if outcome == "ok" and not kwargs.get("stream"):
+            latencies.add(endpoint, elapsed)
+
+
+async def _hedged(client, endpoint, model, kwargs, timeout):
+    """
+    _attempt(), plus a second one if the first is still running after the
+    endpoint's hedge delay; returns whichever succeeds first. Without enough
+    latency samples yet, there is no hedge delay and this is a single attempt.
+    """
+    delay = latencies.quantile(endpoint, OPENAI_HEDGE_QUANTILE, OPENAI_HEDGE_MIN_SAMPLES)
+    started = time.monotonic()
+    deadline = started + timeout
+    hedge_at = deadline if delay is None else started + delay
+    first = asyncio.ensure_future(_attempt(client, endpoint, model, kwargs))
+    tasks = [first]
+    running = {first}
+    error = None
+    try:
+        while running:
+            until = deadline if len(tasks) > 1 else min(deadline, hedge_at)
+            done, running = await asyncio.wait(
+                running, timeout=max(0, until - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        HEDGES.inc(endpoint, "first" if task is first else "hedge")
+                    return task.result()
+                error = task.exception()
+            if not done:
+                if len(tasks) > 1 or time.monotonic() >= deadline:
+                    raise asyncio.TimeoutError()
+                tasks.append(asyncio.ensure_future(_attempt(client, endpoint, model, kwargs)))
+                running.add(tasks[-1])
+        if len(tasks) > 1:
+            HEDGES.inc(endpoint, "neither")
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def record_usage(endpoint, model, usage):
+    if usage is None:
+        return
+    TOKENS.inc(endpoint, model or "", "prompt", amount=usage.prompt_tokens or 0)
+    TOKENS.inc(endpoint, model or "", "completion", amount=usage.completion_tokens or 0)
@@ -1,22 +1,79 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional
+import base64
+import hashlib
 import json
 import os
+import threading
 from datetime import datetime, timedelta
 import scheduler
-from openai import OpenAI
+import serialization
+import storage
+import llm
+import extraction_cache
+import jobs
+import context
+import jsonstream
+import metrics
+import profiling
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 app = FastAPI()
+# Compress larger bodies (bulk planning/learning reads); SSE streams are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# Outermost, so route latencies include compression
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+@app.exception_handler(serialization.DecodeError)
+async def unreadable_data_file(request: Request, exc: serialization.DecodeError):
+    # Never served (or overwritten) as empty data; the message names the file and its format
+    return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
 DATA_FILE = os.path.join(DATA_DIR, "learning_data.json")
 PLANNING_FILE = os.path.join(DATA_DIR, "planning_data.json")
+DB_FILE = os.path.join(DATA_DIR, "recap_plan.db")
+# "json" (data/*.json files) or "sqlite" (data/recap_plan.db)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+# Journal planning edits to an append-only log instead of rewriting planning_data.json
+PLANNING_JOURNAL = os.getenv("PLANNING_JOURNAL", "").lower() in ("1", "true", "yes")
+# JSON backend file format: "json" (indented), "json-compact" or "msgpack"; files in any format are read
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "json")
+# JSON backend: edits arriving within this many milliseconds are written to disk together
+STORAGE_COMMIT_WINDOW_MS = float(os.getenv("STORAGE_COMMIT_WINDOW_MS", "2"))
+# Cache for /api/extract-* results; EXTRACT_CACHE_DISK=1 also keeps them under data/extract_cache
+EXTRACT_CACHE_SIZE = int(os.getenv("EXTRACT_CACHE_SIZE", "256"))
+EXTRACT_CACHE_TTL = float(os.getenv("EXTRACT_CACHE_TTL", "3600"))
+EXTRACT_CACHE_DISK = os.getenv("EXTRACT_CACHE_DISK", "").lower() in ("1", "true", "yes")
+# Concurrent extraction jobs, and how long (seconds) finished job results are kept
+EXTRACT_JOB_WORKERS = int(os.getenv("EXTRACT_JOB_WORKERS", "4"))
+EXTRACT_JOB_TTL = float(os.getenv("EXTRACT_JOB_TTL", "600"))
+# Conversation token budget per endpoint, e.g. CONTEXT_TOKEN_BUDGETS="chat-plan=3000,extract-plan=6000".
+# Older turns beyond the budget are replaced by a summary; the last CONTEXT_KEEP_RECENT turns are always kept.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_TOKEN_BUDGETS = os.getenv("CONTEXT_TOKEN_BUDGETS", "")
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "4"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+# PROFILING=1 lets requests sent with `X-Profile: 1` (or a PROFILE_SAMPLE_RATE fraction of all requests)
+# be profiled into data/profiles, keeping the newest PROFILE_KEEP; see GET /api/profiles
+PROFILING = os.getenv("PROFILING", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+request_profiler = profiling.RequestProfiler(
+    os.path.join(DATA_DIR, "profiles"), sample_rate=PROFILE_SAMPLE_RATE, keep=PROFILE_KEEP,
+)
+if PROFILING:
+    # Must be set before any route is declared
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.ProfilingMiddleware, profiler=request_profiler)
 
 class LearningItem(BaseModel):
     id: Optional[str] = None
@@ -47,6 +104,8 @@ class ExtractPlanRequest(BaseModel):
     start_date: str
     deadline: str
     model: Optional[str] = "gpt-4o-mini"
+    bypass_cache: bool = False  # Skip the cached result and ask the model again
+    stream: bool = False  # Answer with NDJSON, one line per PlanDay as soon as the model has written it
 
 class PlanDay(BaseModel):
     date: str
@@ -71,6 +130,17 @@ class TaskGroup(BaseModel):
     planIds: List[str]
     createdAt: str
 
+class PlanOperation(BaseModel):
+    op: str  # add, update or delete
+    type: str  # dailyPlans, weeklyPlans, taskGroups, ...
+    id: Optional[str] = None  # Target item for update and delete
+    item: Optional[dict] = None  # New item for add
+    updates: Optional[dict] = None  # Fields to change for update
+
+class PlanBatchRequest(BaseModel):
+    operations: List[PlanOperation]
+    base_version: Optional[int] = None  # If set, the batch is rejected (409) when the data has changed since
+
 class PlanningData(BaseModel):
     dailyPlans: List[Plan] = []
     weeklyPlans: List[Plan] = []
@@ -81,71 +151,203 @@ class PlanningData(BaseModel):
     yearlyTaskGroups: List[TaskGroup] = []
 
 
+store = storage.InstrumentedStorage(storage.open_storage(
+    STORAGE_BACKEND, DATA_FILE, PLANNING_FILE, DB_FILE, lambda: PlanningData().dict(),
+    planning_journal=PLANNING_JOURNAL, commit_window=STORAGE_COMMIT_WINDOW_MS / 1000, fmt=STORAGE_FORMAT,
+), STORAGE_BACKEND)
+
+extract_cache = extraction_cache.ExtractionCache(
+    max_entries=EXTRACT_CACHE_SIZE,
+    ttl_seconds=EXTRACT_CACHE_TTL,
+    disk_dir=os.path.join(DATA_DIR, "extract_cache") if EXTRACT_CACHE_DISK else None,
+)
+# Identical extraction requests in flight at the same time share one model call
+extraction_calls = jobs.SingleFlight()
+extraction_jobs = jobs.JobQueue(max_workers=EXTRACT_JOB_WORKERS, result_ttl=EXTRACT_JOB_TTL)
+
 def load_data():
-    if not os.path.exists(DATA_FILE):
-        return []
-    with open(DATA_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+    return store.load_learnings()
 
 def save_data(data):
-    # Ensure directory exists before saving
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    store.save_learnings(data)
 
 def load_planning_data():
-    if not os.path.exists(PLANNING_FILE):
-        return PlanningData().dict()
-    with open(PLANNING_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return PlanningData().dict()
+    return store.load_planning()
 
 def save_planning_data(data):
-    # Ensure directory exists before saving
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        
-    with open(PLANNING_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    store.save_planning(data)
 
 @app.on_event("startup")
 def startup_event():
     # Ensure data directory and file exist
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-    if not os.path.exists(DATA_FILE):
-        save_data([])
-    if not os.path.exists(PLANNING_FILE):
-        save_planning_data(PlanningData().dict())
+    os.makedirs(DATA_DIR, exist_ok=True)
+    store.initialize()
+    # Serve right away; the data files are read (and openai imported) in the background
+    threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+
+def prewarm():
+    store.prewarm()
+    if os.getenv("OPENAI_API_KEY"):
+        # So the first AI request doesn't hold up the event loop importing it
+        llm.preload()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    store.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_ai():
+    await extraction_jobs.shutdown()
+    await llm.close_client()
+
+def get_openai_client():
+    client = llm.get_client()
+    if client is None:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
+    return client
+
+def ai_error_status(e):
+    """503 while llm's circuit breaker is open, 504 when the call ran out of time, otherwise 500"""
+    if isinstance(e, llm.CircuitOpenError):
+        return 503
+    if isinstance(e, llm.DeadlineExceededError):
+        return 504
+    return 500
+
+async def summarize_conversation(previous_summary, messages):
+    """Fold older chat turns (and the summary of anything before them) into a short summary"""
+    client = get_openai_client()
+    transcript = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+    if previous_summary:
+        transcript = f"Summary so far: {previous_summary}\n\nLater messages:\n{transcript}"
+    response = await llm.create_chat_completion(
+        client,
+        "summarize",
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You summarize planning conversations. Keep every goal, deadline, date, constraint, preference and decision the user stated, and any plan already agreed. Be concise; no preamble."},
+            {"role": "user", "content": transcript}
+        ],
+        temperature=0.2,
+        max_tokens=400,
+    )
+    return response.choices[0].message.content
+
+compactor = context.ContextCompactor(
+    summarize_conversation,
+    context.parse_budgets(CONTEXT_TOKEN_BUDGETS, CONTEXT_TOKEN_BUDGET),
+    keep_recent=CONTEXT_KEEP_RECENT,
+)
+
+async def build_conversation_text(endpoint, conversation: List[ChatMessage]):
+    """The conversation as "role: content" lines, compacted to the endpoint's token budget"""
+    messages = await compactor.compact(endpoint, [{"role": msg.role, "content": msg.content} for msg in conversation])
+    return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+
+def etag_for(collection, *parts, query=""):
+    """Strong ETag for a bulk read, derived from the storage version of the collection"""
+    if query:
+        # Different pages/filters of the same collection are different representations
+        parts = (*parts, hashlib.sha1(query.encode("utf-8")).hexdigest()[:12])
+    return '"' + "-".join([collection, *parts, store.version_token(collection)]) + '"'
+
+def is_not_modified(request: Request, etag):
+    """True if the client's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def not_modified_response(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def set_etag(response: Response, etag):
+    response.headers["ETag"] = etag
+    # Let browsers keep the body but revalidate every time
+    response.headers["Cache-Control"] = "no-cache"
+
+# Page size when a cursor is given without a limit, and the largest page allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(key):
+    """Opaque cursor for the (date, id) of the last item on a page"""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    if cursor is None:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(key) == 2 and all(isinstance(part, str) for part in key):
+            return tuple(key)
+    except (ValueError, TypeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_size(limit, cursor):
+    if limit is None and cursor is not None:
+        return DEFAULT_PAGE_SIZE
+    return limit
+
+def project(items, fields):
+    """Keep only the comma-separated `fields` of each item"""
+    if not fields:
+        return items
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return [{name: item[name] for name in names if name in item} for item in items]
 
 @app.get("/api/learnings", response_model=List[LearningItem])
-def get_learnings():
-    return load_data()
+def get_learnings(
+    request: Request,
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Get learnings; with no query parameters, all of them in stored order.
+    `from`/`to` filter on `date` (inclusive), `limit`/`cursor` page through the
+    results in (date, id) order with the next cursor in the X-Next-Cursor
+    header, and `fields` (comma-separated) selects which fields to return.
+    """
+    # Bad requests fail even when If-None-Match would match
+    after = decode_cursor(cursor)
+    etag = etag_for("learnings", query=request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if not (date_from or date_to or limit or cursor or fields):
+        set_etag(response, etag)
+        return load_data()
+    
+    items, next_key = store.page_learnings(date_from, date_to, after, page_size(limit, cursor))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_key is not None:
+        headers["X-Next-Cursor"] = encode_cursor(next_key)
+    # Same shape as the unpaged response: LearningItem's fields only, without scheduler state (ease, interval, ...)
+    items = [LearningItem(**item).dict() for item in items]
+    return JSONResponse(project(items, fields), headers=headers)
 
 @app.post("/api/learnings", response_model=LearningItem)
 def add_learning(item: LearningItem):
-    data = load_data()
-    # Simple ID generation
-    item.id = str(len(data) + 1)
+    # Never reuses an id, even after deletes
+    item.id = store.allocate_id()
     
-    # Calculate recap dates based on spaced repetition (1, 3, 7, 15, 30 days)
-    learning_date = datetime.strptime(item.date, "%Y-%m-%d")
-    intervals = [1, 3, 7, 15, 30]
-    item.recap_dates = [(learning_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in intervals]
+    # Calculate recap dates based on spaced repetition (see scheduler.RECAP_INTERVALS)
+    item.recap_dates = scheduler.recap_dates(item.date)
     
     # Initialize completed_dates as empty list
     if not item.completed_dates:
         item.completed_dates = []
     
-    data.append(item.dict())
-    save_data(data)
+    store.add_learning(item.dict())
     return item
 
 @app.patch("/api/learnings/{item_id}")
@@ -155,84 +357,128 @@ def update_learning_status(item_id: str, completed: bool, date: str = None):
     If date is provided, toggle that date in completed_dates.
     The 'completed' parameter is kept for backward compatibility but deprecated.
     """
-    data = load_data()
-    for item in data:
-        if item["id"] == item_id:
-            # Initialize completed_dates if it doesn't exist (backward compatibility)
-            if "completed_dates" not in item:
-                item["completed_dates"] = []
-            
-            if date:
-                # Toggle completion for this specific date
-                if completed:
-                    # Add the date if not already in the list
-                    if date not in item["completed_dates"]:
-                        item["completed_dates"].append(date)
-                else:
-                    # Remove the date if it's in the list
-                    if date in item["completed_dates"]:
-                        item["completed_dates"].remove(date)
+    def change(item):
+        # Work on a copy; the store swaps it in atomically
+        item = dict(item)
+        # Initialize completed_dates if it doesn't exist (backward compatibility)
+        item["completed_dates"] = list(item.get("completed_dates") or [])
+        
+        if date:
+            # Toggle completion for this specific date
+            if completed:
+                # Add the date if not already in the list
+                if date not in item["completed_dates"]:
+                    item["completed_dates"].append(date)
             else:
-                # Fallback to old behavior for backward compatibility
-                item["completed"] = completed
-            
-            save_data(data)
-            return {"message": "Status updated", "item": item}
-    raise HTTPException(status_code=404, detail="Item not found")
+                # Remove the date if it's in the list
+                if date in item["completed_dates"]:
+                    item["completed_dates"].remove(date)
+        else:
+            # Fallback to old behavior for backward compatibility
+            item["completed"] = completed
+        return item
+    
+    item = store.modify_learning(item_id, change)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {"message": "Status updated", "item": item}
 
 @app.delete("/api/learnings/{item_id}")
 def delete_learning(item_id: str):
-    data = load_data()
-    # Filter out the item with the given ID
-    new_data = [item for item in data if item["id"] != item_id]
-    
-    if len(new_data) == len(data):
+    if not store.delete_learning(item_id):
         raise HTTPException(status_code=404, detail="Item not found")
-        
-    save_data(new_data)
     return {"message": "Item deleted successfully"}
 
 @app.put("/api/learnings/{item_id}")
 def update_learning_content(item_id: str, learning_update: LearningItem):
-    data = load_data()
-    for item in data:
-        if item["id"] == item_id:
-            item["content"] = learning_update.content
-            save_data(data)
-            return {"message": "Content updated", "item": item}
-    raise HTTPException(status_code=404, detail="Item not found")
+    item = store.modify_learning(item_id, lambda item: {**item, "content": learning_update.content})
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {"message": "Content updated", "item": item}
 
 @app.get("/api/reminders")
-def get_reminders(date: str = None):
+def get_reminders(date: str = None, start: str = None, end: str = None):
+    """
+    Get learnings due for review.
+    With `date` (defaults to today) returns the list of items due that day.
+    With `start` and `end` (inclusive) returns {date: [items]} for every day in the range that has reminders.
+    """
+    if start or end:
+        if not (start and end):
+            raise HTTPException(status_code=400, detail="Both start and end are required for a range")
+        for value in (start, end):
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+        return store.reminders_between(start, end)
+
     # If date is not provided, use today. Format YYYY-MM-DD
     if not date:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    data = load_data()
-    reminders = []
-    for item in data:
-        if item.get("recap_dates") and date in item["recap_dates"]:
-            reminders.append(item)
-    return reminders
+    return store.reminders_between(date, date).get(date, [])
 
-# Use the scheduler functional module
-@app.get("/api/schedule")
-def get_future_schedule():
-    return scheduler.get_future_plans()
+# Longest window /api/schedule will return
+MAX_SCHEDULE_HORIZON = 3660
 
-@app.post("/api/chat-plan", response_model=ChatResponse)
-async def chat_about_plan(request: ChatRequest):
+@app.get("/api/schedule")
+def get_future_schedule(
+    request: Request,
+    response: Response,
+    horizon: int = Query(30, ge=1, le=MAX_SCHEDULE_HORIZON),
+    start: Optional[str] = None,
+    items: bool = True,
+):
     """
-    Interactive chat with ChatGPT about planning
+    Upcoming reviews for `horizon` days from `start` (defaults to today): one
+    entry per day that has reviews, with how many are due and how many are
+    already completed, plus the items themselves unless items=false.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
+    if not start:
+        start = datetime.now().strftime("%Y-%m-%d")
+    try:
+        end = (datetime.strptime(start, "%Y-%m-%d") + timedelta(days=horizon - 1)).strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date '{start}', expected YYYY-MM-DD")
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    # start is part of the tag because it defaults to a date that changes daily
+    etag = etag_for("learnings", "schedule", start, query=request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
-    # System message for the planning assistant
+    days = store.review_schedule(start, end, include_items=items)
+    return {
+        "start": start,
+        "end": end,
+        "due": sum(day["due"] for day in days),
+        "completed": sum(day["completed"] for day in days),
+        "days": days,
+    }
+
+@app.post("/api/learnings/reschedule")
+def reschedule_learnings(today: Optional[str] = None):
+    """
+    Adapt every learning's next review to how its past reviews went (see
+    scheduler.reschedule). Safe to call repeatedly, e.g. once a day.
+    """
+    if not today:
+        today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(today, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date '{today}', expected YYYY-MM-DD")
+    if not scheduler.numpy_available():
+        raise HTTPException(status_code=503, detail="Adaptive rescheduling needs the numpy package")
+
+    rescheduled = store.modify_learnings(lambda learnings: scheduler.reschedule(learnings, today))
+    return {"rescheduled": rescheduled, "total": len(store.load_learnings())}
+
+async def build_chat_messages(request: ChatRequest):
+    """System prompt for the planning assistant followed by the conversation so far (compacted to budget)"""
     today = datetime.now().strftime("%Y-%m-%d")
     system_message = {
         "role": "system",
@@ -249,13 +495,27 @@ Engage in a natural conversation to understand their needs before suggesting a p
     }
     
     # Convert request messages to OpenAI format
-    messages = [system_message]
-    for msg in request.messages:
-        messages.append({"role": msg.role, "content": msg.content})
+    conversation = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    return [system_message] + await compactor.compact("chat-plan", conversation)
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/api/chat-plan", response_model=ChatResponse)
+async def chat_about_plan(request: ChatRequest):
+    """
+    Interactive chat with ChatGPT about planning
+    """
+    client = get_openai_client()
+    messages = await build_chat_messages(request)
     
     try:
         # Call OpenAI API
-        response = client.chat.completions.create(
+        response = await llm.create_chat_completion(
+            client,
+            "/api/chat-plan",
             model=request.model,
             messages=messages,
             temperature=0.7,
@@ -265,20 +525,241 @@ Engage in a natural conversation to understand their needs before suggesting a p
         return ChatResponse(message=response.choices[0].message.content)
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to chat with AI: {str(e)}")
+        raise HTTPException(status_code=ai_error_status(e), detail=f"Failed to chat with AI: {str(e)}")
+
+@app.post("/api/chat-plan/stream")
+async def chat_about_plan_stream(request: ChatRequest):
+    """
+    Same as /api/chat-plan, but streams the reply as Server-Sent Events.
+    Each token arrives as `data: {"delta": "..."}`; the stream ends with
+    `event: done` carrying the full ChatResponse ({"message": "..."}), or
+    `event: error` with {"detail": "..."} if the upstream call fails midway.
+    """
+    client = get_openai_client()
+    messages = await build_chat_messages(request)
+    
+    try:
+        stream = await llm.create_chat_completion(
+            client,
+            "/api/chat-plan/stream",
+            model=request.model,
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=ai_error_status(e), detail=f"Failed to chat with AI: {str(e)}")
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    llm.record_usage("/api/chat-plan/stream", request.model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+        except Exception as e:
+            yield sse_event({"detail": f"Failed to chat with AI: {str(e)}"}, event="error")
+            return
+        yield sse_event(ChatResponse(message="".join(parts)).dict(), event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+EXTRACT_ERRORS = metrics.counter(
+    "extract_errors_total",
+    "Failed /api/extract-* model calls: parse (not JSON), invalid (not a plan) or upstream (API error)",
+    ["endpoint", "reason"],
+)
+
+async def run_extraction(endpoint, request: ExtractPlanRequest, system_prompt, extraction_prompt, failure_message):
+    """
+    Ask the model for a JSON plan and validate it as a PhasedPlanResponse.
+    Shared by the /api/extract-* endpoints; each one only builds its own prompts.
+    extraction_prompt(conversation_text) is only called on a cache miss, since
+    compacting a long conversation can itself take model calls.
+    Results are cached per endpoint, model, raw conversation and date range unless
+    the request sets bypass_cache (a bypassed call still refreshes the cache),
+    and identical requests already in flight wait for the same model call.
+    With request.stream the plan is sent as NDJSON instead (see stream_extraction).
+    """
+    cache_key = extraction_cache.make_key(
+        endpoint,
+        request.model,
+        [msg.dict() for msg in request.conversation],
+        request.start_date,
+        request.deadline,
+    )
+    if not request.bypass_cache:
+        cached = await extract_cache.get_async(cache_key)
+        if cached is not None:
+            if request.stream:
+                return ndjson_response(cached_plan_lines(cached))
+            return PhasedPlanResponse(**cached)
+    
+    client = get_openai_client()
+    # Token budgets are keyed by the endpoint's name, e.g. "extract-plan"
+    conversation_text = await build_conversation_text(endpoint.removeprefix("/api/"), request.conversation)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": extraction_prompt(conversation_text)}
+    ]
+    if request.stream:
+        return await stream_extraction(endpoint, client, request, messages, cache_key, failure_message)
+    
+    async def call_model():
+        try:
+            # Call OpenAI API
+            response = await llm.create_chat_completion(
+                client,
+                endpoint,
+                model=request.model,
+                messages=messages,
+                temperature=0.3,
+                response_format={"type": "json_object"}
+            )
+            
+            # Parse the response
+            result_text = response.choices[0].message.content
+            result_json = json.loads(result_text)
+            
+            # Validate
+            result = PhasedPlanResponse(**result_json)
+            
+        except json.JSONDecodeError as e:
+            EXTRACT_ERRORS.inc(endpoint, "parse")
+            raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+        except Exception as e:
+            EXTRACT_ERRORS.inc(endpoint, "invalid" if isinstance(e, ValidationError) else "upstream")
+            raise HTTPException(status_code=ai_error_status(e), detail=f"Failed to {failure_message}: {str(e)}")
+        
+        await extract_cache.set_async(cache_key, result.dict())
+        return result
+    
+    return await extraction_calls.do(cache_key, call_model)
+
+def ndjson_line(data):
+    return json.dumps(data) + "\n"
+
+def ndjson_response(lines):
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def cached_plan_lines(result):
+    for plan in result["plans"]:
+        yield ndjson_line({"type": "plan", "plan": plan})
+    yield ndjson_line({"type": "done", "count": len(result["plans"])})
+
+async def stream_extraction(endpoint, client, request: ExtractPlanRequest, messages, cache_key, failure_message):
+    """
+    Streaming form of run_extraction's model call. The model's JSON is parsed
+    as it arrives and each PlanDay is sent as a {"type": "plan", "plan": {...}}
+    line once its object closes. The whole document is validated at the end
+    (and cached) before a final {"type": "done", "count": n} line; if the call
+    fails or the result isn't a valid plan, the last line is
+    {"type": "error", "detail": "..."} instead.
+    """
+    try:
+        stream = await llm.create_chat_completion(
+            client,
+            endpoint,
+            model=request.model,
+            messages=messages,
+            temperature=0.3,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+    except Exception as e:
+        EXTRACT_ERRORS.inc(endpoint, "upstream")
+        raise HTTPException(status_code=ai_error_status(e), detail=f"Failed to {failure_message}: {str(e)}")
+    
+    async def lines():
+        parser = jsonstream.ArrayItemParser("plans")
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    llm.record_usage(endpoint, request.model, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for item in parser.feed(chunk.choices[0].delta.content):
+                    # Anything that isn't an object fails validation of the whole plan below
+                    if isinstance(item, dict):
+                        yield ndjson_line({"type": "plan", "plan": PlanDay(**item).dict()})
+            result = PhasedPlanResponse(**parser.document())
+        except json.JSONDecodeError as e:
+            EXTRACT_ERRORS.inc(endpoint, "parse")
+            yield ndjson_line({"type": "error", "detail": f"Failed to parse AI response: {str(e)}"})
+            return
+        except Exception as e:
+            EXTRACT_ERRORS.inc(endpoint, "invalid" if isinstance(e, ValidationError) else "upstream")
+            yield ndjson_line({"type": "error", "detail": f"Failed to {failure_message}: {str(e)}"})
+            return
+        finally:
+            # Also stops the upstream call if the client goes away mid-stream
+            await stream.close()
+        
+        await extract_cache.set_async(cache_key, result.dict())
+        yield ndjson_line({"type": "done", "count": len(result.plans)})
+    
+    return ndjson_response(lines())
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of the counters and histograms in metrics.REGISTRY"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/profiles")
+def list_profiles(limit: int = Query(50, ge=1, le=1000)):
+    """Recently profiled requests, newest first (see PROFILING)"""
+    return {"enabled": PROFILING, "profiles": request_profiler.list(limit)}
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str, sort: str = "cumulative", limit: int = Query(40, ge=1, le=1000), raw: bool = False):
+    """
+    A saved profile as pstats' text report sorted by `sort` (cumulative,
+    tottime, calls, ...), or the .prof file itself with raw=true.
+    """
+    if raw:
+        path = request_profiler.path(profile_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    try:
+        report = request_profiler.summary(profile_id, sort, limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key '{sort}'")
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(report, media_type="text/plain")
+
+@app.get("/api/extract-cache")
+def get_extract_cache_stats():
+    """Hit/miss counters and size of the extraction cache"""
+    return extract_cache.stats()
+
+@app.delete("/api/extract-cache")
+def clear_extract_cache():
+    """Drop every cached extraction result"""
+    extract_cache.clear()
+    return {"message": "Extraction cache cleared"}
 
 @app.post("/api/extract-plan", response_model=PhasedPlanResponse)
 async def extract_plan_from_conversation(request: ExtractPlanRequest):
     """
     Extract a structured plan from the conversation
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
     # Calculate number of days available
     start_dt = datetime.strptime(request.start_date, "%Y-%m-%d")
     deadline_dt = datetime.strptime(request.deadline, "%Y-%m-%d")
@@ -287,11 +768,9 @@ async def extract_plan_from_conversation(request: ExtractPlanRequest):
     if days_available <= 0:
         raise HTTPException(status_code=400, detail="Deadline must be after start date")
     
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt
-    extraction_prompt = f"""Based on the following conversation about planning a task, create a detailed structured plan.
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about planning a task, create a detailed structured plan.
 
 Conversation:
 {conversation_text}
@@ -321,30 +800,9 @@ Guidelines:
 - Ensure all work is completed before the deadline
 - Return ONLY valid JSON, no additional text"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # Validate and return
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract monthly plan: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-plan", request, system_prompt, extraction_prompt, "extract monthly plan")
 
 
 @app.post("/api/extract-monthly-goals", response_model=PhasedPlanResponse)
@@ -352,18 +810,9 @@ async def extract_monthly_goals_from_conversation(request: ExtractPlanRequest):
     """
     Extract a monthly goals plan from the conversation (for monthly view)
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt for monthly goals
-    extraction_prompt = f"""Based on the following conversation about planning monthly goals, create a list of key tasks and goals for EACH month in the period.
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about planning monthly goals, create a list of key tasks and goals for EACH month in the period.
 
 Conversation:
 {conversation_text}
@@ -395,29 +844,9 @@ Guidelines:
 - Set section to "goals"
 - Return ONLY valid JSON"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured monthly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract monthly goals: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured monthly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-monthly-goals", request, system_prompt, extraction_prompt, "extract monthly goals")
 
 
 @app.post("/api/extract-weekly-breakdown", response_model=PhasedPlanResponse)
@@ -425,18 +854,9 @@ async def extract_weekly_breakdown_from_conversation(request: ExtractPlanRequest
     """
     Extract a weekly breakdown plan from the conversation (breaking down a monthly task)
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt for weekly breakdown
-    extraction_prompt = f"""Based on the following conversation about breaking down a monthly task, create a detailed weekly breakdown plan.
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about breaking down a monthly task, create a detailed weekly breakdown plan.
 
 Conversation:
 {conversation_text}
@@ -469,29 +889,9 @@ Guidelines:
 - Distribute work evenly across the available weeks (as mentioned in conversation)
 - Return ONLY valid JSON"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured weekly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract weekly breakdown: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured weekly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-weekly-breakdown", request, system_prompt, extraction_prompt, "extract weekly breakdown")
 
 
 @app.post("/api/extract-daily-breakdown", response_model=PhasedPlanResponse)
@@ -499,18 +899,9 @@ async def extract_daily_breakdown_from_conversation(request: ExtractPlanRequest)
     """
     Extract a daily breakdown plan from the conversation (breaking down a weekly task)
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt for daily breakdown
-    extraction_prompt = f"""Based on the following conversation about breaking down a weekly task, create a detailed daily breakdown plan.
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about breaking down a weekly task, create a detailed daily breakdown plan.
 
 Conversation:
 {conversation_text}
@@ -538,29 +929,9 @@ Guidelines:
 - Distribute work logically across the week
 - Return ONLY valid JSON"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured daily plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract daily breakdown: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured daily plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-daily-breakdown", request, system_prompt, extraction_prompt, "extract daily breakdown")
 
 
 @app.post("/api/extract-daily-subtasks", response_model=PhasedPlanResponse)
@@ -568,18 +939,9 @@ async def extract_daily_subtasks_from_conversation(request: ExtractPlanRequest):
     """
     Extract a section-based breakdown plan from the conversation (breaking down a Whole Day task into Morning/Afternoon/Evening)
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt for daily subtasks
-    extraction_prompt = f"""Based on the following conversation about breaking down a daily task, distribute the work across daily sections (Morning, Afternoon, Evening).
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about breaking down a daily task, distribute the work across daily sections (Morning, Afternoon, Evening).
 
 Conversation:
 {conversation_text}
@@ -610,29 +972,9 @@ Guidelines:
 - Identify actionable steps fitting for the time of day
 - Return ONLY valid JSON"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured section plans. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract subtasks: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured section plans. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-daily-subtasks", request, system_prompt, extraction_prompt, "extract subtasks")
 
 
 @app.post("/api/extract-monthly-plan", response_model=PhasedPlanResponse)
@@ -640,18 +982,9 @@ async def extract_monthly_plan_from_conversation(request: ExtractPlanRequest):
     """
     Extract a monthly breakdown plan from the conversation (for yearly goals)
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-    
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Build conversation context
-    conversation_text = "\n".join([f"{msg.role}: {msg.content}" for msg in request.conversation])
-    
     # Create extraction prompt for monthly breakdown
-    extraction_prompt = f"""Based on the following conversation about breaking down a yearly goal, create a detailed monthly breakdown plan.
+    def extraction_prompt(conversation_text):
+        return f"""Based on the following conversation about breaking down a yearly goal, create a detailed monthly breakdown plan.
 
 Conversation:
 {conversation_text}
@@ -681,30 +1014,62 @@ Guidelines:
 - Ensure the plan covers the entire period from start to deadline
 - Return ONLY valid JSON, no additional text"""
     
-    try:
-        # Call OpenAI API
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": f"You are a planning assistant that extracts structured monthly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # Validate and return
-        return PhasedPlanResponse(**result_json)
-        
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract monthly plan: {str(e)}")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = f"You are a planning assistant that extracts structured monthly plans from conversations. Today's date is {today_str}. Always respond with valid JSON only."
+    return await run_extraction("/api/extract-monthly-plan", request, system_prompt, extraction_prompt, "extract monthly plan")
+
+
+# ============================================
+# Extraction Jobs
+# ============================================
+
+EXTRACT_ENDPOINTS = {
+    "extract-plan": extract_plan_from_conversation,
+    "extract-monthly-goals": extract_monthly_goals_from_conversation,
+    "extract-weekly-breakdown": extract_weekly_breakdown_from_conversation,
+    "extract-daily-breakdown": extract_daily_breakdown_from_conversation,
+    "extract-daily-subtasks": extract_daily_subtasks_from_conversation,
+    "extract-monthly-plan": extract_monthly_plan_from_conversation,
+}
+
+@app.post("/api/jobs/{endpoint}", status_code=202)
+async def submit_extraction_job(endpoint: str, request: ExtractPlanRequest):
+    """
+    Run any /api/<endpoint> extraction in the background and return a job id right away.
+    Submitting a request identical to one still running returns the existing job.
+    """
+    handler = EXTRACT_ENDPOINTS.get(endpoint)
+    if handler is None:
+        raise HTTPException(status_code=404, detail=f"Unknown extraction endpoint '{endpoint}'")
+    
+    key = extraction_cache.make_key(
+        f"/api/{endpoint}",
+        request.model,
+        [msg.dict() for msg in request.conversation],
+        request.start_date,
+        request.deadline,
+    )
+    # A job's result is the plan itself, never a stream
+    request.stream = False
+    job = extraction_jobs.submit(key, endpoint, lambda: handler(request))
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}")
+async def get_extraction_job(job_id: str, wait: float = 0):
+    """
+    Get a job's status, and its result once done.
+    `wait` (seconds, max 60) long-polls until the job finishes or the time runs out.
+    """
+    job = extraction_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await extraction_jobs.wait(job, min(max(wait, 0), 60))
+    return job.to_dict()
+
+@app.get("/api/jobs")
+def get_extraction_job_stats():
+    """Job counts by status"""
+    return extraction_jobs.stats()
 
 
 # ============================================
@@ -712,70 +1077,127 @@ Guidelines:
 # ============================================
 
 @app.get("/api/planning", response_model=PlanningData)
-def get_all_planning_data():
+def get_all_planning_data(request: Request, response: Response):
     """Get all planning data (daily, weekly, monthly, yearly plans and task groups)"""
-    return load_planning_data()
+    etag = etag_for("planning")
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    # Items were validated on the way in; skip re-validating the whole document on the way out
+    return JSONResponse(load_planning_data(), headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 @app.get("/api/planning/{plan_type}")
-def get_planning_by_type(plan_type: str):
-    """Get specific planning data by type (dailyPlans, weeklyPlans, monthlyPlans, yearlyPlans, taskGroups, etc.)"""
-    data = load_planning_data()
-    if plan_type not in data:
+def get_planning_by_type(
+    plan_type: str,
+    request: Request,
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Get specific planning data by type (dailyPlans, weeklyPlans, monthlyPlans, yearlyPlans, taskGroups, etc.)
+    Accepts the same `from`/`to`/`limit`/`cursor`/`fields` parameters as GET /api/learnings;
+    when paging, the next cursor is returned as `next_cursor`.
+    """
+    # Validated first: an unknown type is a 404 even for If-None-Match: *
+    if plan_type not in store.plan_types():
         raise HTTPException(status_code=404, detail=f"Planning type '{plan_type}' not found")
-    return {plan_type: data[plan_type]}
+    after = decode_cursor(cursor)
+    etag = etag_for("planning", plan_type, query=request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
+    if not (date_from or date_to or limit or cursor or fields):
+        return {plan_type: store.load_plan_type(plan_type), "version": store.planning_version()}
+    
+    items, next_key = store.page_plan_type(plan_type, date_from, date_to, after, page_size(limit, cursor))
+    return {
+        plan_type: project(items, fields),
+        "version": store.planning_version(),
+        "next_cursor": encode_cursor(next_key),
+    }
+
+def assign_plan_id(plan_type: str, item: dict):
+    """Give a new plan item a server-allocated id if the client didn't send one."""
+    if not item.get("id"):
+        item["id"] = store.allocate_id(taken=lambda item_id: store.get_plan_item(plan_type, item_id) is not None)
+
+@app.post("/api/planning/batch")
+def apply_planning_operations(batch: PlanBatchRequest):
+    """
+    Apply a list of add/update/delete operations across planning types in one write.
+    All operations succeed or none do. Returns the new planning version and, per
+    operation, the resulting item (null for deletes).
+    """
+    plan_types = store.plan_types()
+    operations = []
+    for op in batch.operations:
+        if op.type not in plan_types:
+            raise HTTPException(status_code=404, detail=f"Planning type '{op.type}' not found")
+        if op.op == "add":
+            if op.item is None:
+                raise HTTPException(status_code=400, detail="add requires 'item'")
+            assign_plan_id(op.type, op.item)
+        elif op.op in ("update", "delete"):
+            if op.id is None:
+                raise HTTPException(status_code=400, detail=f"{op.op} requires 'id'")
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown operation '{op.op}'")
+        operations.append(op.dict())
+    
+    try:
+        version, items = store.apply_plan_ops(operations, base_version=batch.base_version)
+    except storage.VersionConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Planning data has changed", "version": e.current_version},
+        )
+    except storage.ItemNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"message": f"{len(operations)} operations applied", "version": version, "items": items}
 
 @app.post("/api/planning/{plan_type}")
 def add_plan_item(plan_type: str, item: dict):
     """Add a new plan item to a specific planning type"""
-    data = load_planning_data()
-    if plan_type not in data:
+    if plan_type not in store.plan_types():
         raise HTTPException(status_code=404, detail=f"Planning type '{plan_type}' not found")
     
-    data[plan_type].append(item)
-    save_planning_data(data)
+    assign_plan_id(plan_type, item)
+    store.add_plan_item(plan_type, item)
     return {"message": f"Item added to {plan_type}", "item": item}
 
 @app.put("/api/planning/{plan_type}")
 def update_planning_type(plan_type: str, items: List[dict]):
     """Replace all items in a specific planning type"""
-    data = load_planning_data()
-    if plan_type not in data:
+    if plan_type not in store.plan_types():
         raise HTTPException(status_code=404, detail=f"Planning type '{plan_type}' not found")
     
-    data[plan_type] = items
-    save_planning_data(data)
+    store.replace_plan_type(plan_type, items)
     return {"message": f"{plan_type} updated successfully", "count": len(items)}
 
 @app.patch("/api/planning/{plan_type}/{item_id}")
 def update_plan_item(plan_type: str, item_id: str, updates: dict):
     """Update a specific plan item"""
-    data = load_planning_data()
-    if plan_type not in data:
+    if plan_type not in store.plan_types():
         raise HTTPException(status_code=404, detail=f"Planning type '{plan_type}' not found")
     
-    items = data[plan_type]
-    for item in items:
-        if item.get("id") == item_id:
-            item.update(updates)
-            save_planning_data(data)
-            return {"message": "Item updated", "item": item}
-    
-    raise HTTPException(status_code=404, detail="Item not found")
+    # Build a new dict rather than editing the stored one in place
+    item = store.modify_plan_item(plan_type, item_id, lambda item: {**item, **updates})
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {"message": "Item updated", "item": item}
 
 @app.delete("/api/planning/{plan_type}/{item_id}")
 def delete_plan_item(plan_type: str, item_id: str):
     """Delete a specific plan item"""
-    data = load_planning_data()
-    if plan_type not in data:
+    if plan_type not in store.plan_types():
         raise HTTPException(status_code=404, detail=f"Planning type '{plan_type}' not found")
     
-    original_count = len(data[plan_type])
-    data[plan_type] = [item for item in data[plan_type] if item.get("id") != item_id]
-    
-    if len(data[plan_type]) == original_count:
+    if not store.delete_plan_item(plan_type, item_id):
         raise HTTPException(status_code=404, detail="Item not found")
     
-    save_planning_data(data)
     return {"message": "Item deleted successfully"}
 
 @app.put("/api/planning")
@@ -0,0 +1,252 @@
+"""
+Opt-in cProfile of single requests.
+
+With PROFILING=1, a request carrying an `X-Profile: 1` header (or picked at
+random with PROFILE_SAMPLE_RATE) is profiled and the result saved under
+DATA_DIR/profiles as <id>.prof (load it with pstats or snakeviz) plus
+<id>.json describing the request. The response carries the id in an
+X-Profile-Id header.
+
+Only the request's own work is counted, even with other requests running:
+
+- On the event loop, the request's coroutine (and any task it starts) is
+  stepped with the profiler enabled only while it runs, so time other
+  requests spend on the loop between its awaits is left out.
+- Sync handlers run in a worker thread. ProfiledRoute wraps them so that,
+  when the request is being profiled, the call runs under its own profiler
+  in that thread; the two profiles are merged when the request finishes.
+
+JSON storage writes run on the storage writer thread (see GroupCommitWriter),
+so in a profile they appear as the handler waiting for the write to commit.
+
+With PROFILING unset nothing is installed. With it set, requests that
+aren't profiled cost one context variable lookup.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from fastapi.routing import APIRoute
+
+HEADER = b"x-profile"
+
+_session = contextvars.ContextVar("profiling_session", default=None)
+
+
+class ProfileSession:
+    """The profilers collecting one request's work."""
+
+    def __init__(self):
+        now = time.time()
+        # Sorts by start time
+        self.id = time.strftime("%Y%m%d-%H%M%S-", time.localtime(now)) + f"{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}"
+        self.loop_profile = cProfile.Profile()
+        self.thread_profiles = []
+        self.skipped_steps = 0  # Steps that couldn't be profiled because another profiler was active
+        self._lock = threading.Lock()
+
+    def run_in_thread(self, func, args, kwargs):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.thread_profiles.append(profile)
+        return profile.runcall(func, *args, **kwargs)
+
+    def stats(self):
+        stats = pstats.Stats(self.loop_profile)
+        for profile in self.thread_profiles:
+            stats.add(profile)
+        return stats
+
+
+class _Stepped:
+    """Awaitable that drives a coroutine with the session's profiler on only while it runs."""
+
+    def __init__(self, coro, session):
+        self.coro = coro
+        self.session = session
+
+    def __await__(self):
+        coro = self.coro
+        profile = self.session.loop_profile
+        value, error = None, None
+        while True:
+            try:
+                profile.enable()
+                enabled = True
+            except ValueError:
+                # Another profiler is already active on this thread (or, on 3.12+, in the process)
+                self.session.skipped_steps += 1
+                enabled = False
+            try:
+                if error is not None:
+                    yielded = coro.throw(error)
+                else:
+                    yielded = coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                if enabled:
+                    profile.disable()
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                value, error = None, e
+
+
+async def _run_stepped(coro, session):
+    return await _Stepped(coro, session)
+
+
+def _task_factory(loop, coro, **kwargs):
+    # Tasks started while handling a profiled request (task groups, shared model calls) are profiled too
+    session = _session.get()
+    if session is not None:
+        coro = _run_stepped(coro, session)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+def _profile_sync(endpoint):
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        session = _session.get()
+        if session is None:
+            return endpoint(*args, **kwargs)
+        return session.run_in_thread(endpoint, args, kwargs)
+
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoints can be profiled in their worker thread."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profile_sync(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores the results in `directory`."""
+
+    def __init__(self, directory, sample_rate=0.0, keep=50):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep = keep
+
+    def wanted(self, scope):
+        # ASGI header names are already lower-case bytes
+        for name, value in scope.get("headers", ()):
+            if name == HEADER:
+                return value.strip().lower() in (b"1", b"true", b"yes")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, session, info):
+        os.makedirs(self.directory, exist_ok=True)
+        session.stats().dump_stats(os.path.join(self.directory, session.id + ".prof"))
+        info = {"id": session.id, **info}
+        if session.skipped_steps:
+            info["skipped_steps"] = session.skipped_steps
+        with open(os.path.join(self.directory, session.id + ".json"), "w") as f:
+            json.dump(info, f)
+        self._prune()
+
+    def _prune(self):
+        ids = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+        for profile_id in ids[:-self.keep] if self.keep else []:
+            for ext in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit=50):
+        """Newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+            if len(profiles) >= limit:
+                break
+        return profiles
+
+    def path(self, profile_id):
+        """The .prof file for an id, or None."""
+        if not re.fullmatch(r"[0-9a-f-]+", profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + ".prof")
+        return path if os.path.exists(path) else None
+
+    def summary(self, profile_id, sort="cumulative", limit=40):
+        """pstats' text report for a saved profile, or None."""
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests RequestProfiler.wanted() picks."""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        if loop.get_task_factory() is None:
+            loop.set_task_factory(_task_factory)
+
+        session = ProfileSession()
+        status = [500]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", session.id.encode("ascii"))]}
+            await send(message)
+
+        token = _session.set(session)
+        started = time.perf_counter()
+        try:
+            await _Stepped(self.app(scope, receive, send_with_id), session)
+        finally:
+            elapsed = time.perf_counter() - started
+            _session.reset(token)
+            route = scope.get("route")
+            info = {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status[0],
+                "duration_ms": round(elapsed * 1000, 2),
+            }
+            await loop.run_in_executor(None, self.profiler.save, session, info)
+
@@ -1,6 +1,244 @@
-def get_future_plans():
+"""
+Spaced-repetition scheduling for learnings.
+
+A new learning is reviewed RECAP_INTERVALS days after its date. ReviewCalendar
+is the materialized view of those reviews: for every date, the learnings due
+that day and how many of them are already done (the date is in the item's
+completed_dates). Storage keeps a calendar up to date as learnings are added,
+edited and deleted, so reminders for a day or due counts for the next 90 days
+only touch the dates asked for instead of scanning every learning.
+
+reschedule() adapts the schedule to how reviews actually went, SM-2 style:
+each learning carries an ease factor and a current interval, a review done on
+its date grows the interval, a missed one resets it to a day. It works on
+whole columns with NumPy so a backlog of hundreds of thousands of learnings
+is rescheduled in one pass. NumPy is imported on the first reschedule() rather
+than with this module, since nothing else needs it and it's slow to import.
+"""
+import bisect
+from datetime import date as Date, datetime, timedelta
+
+np = None  # Set by numpy_available()
+
+# Days after a learning's date on which it comes up for review
+RECAP_INTERVALS = [1, 3, 7, 15, 30]
+
+# SM-2 parameters for reschedule()
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+GRADE_ON_TIME = 4  # Quality (0-5) of a review completed on its date
+GRADE_MISSED = 1  # Quality of a review whose date passed without completing it
+MAX_INTERVAL = 365  # Days
+
+
+def recap_dates(learning_date, intervals=RECAP_INTERVALS):
+    """Review dates (YYYY-MM-DD) for a learning dated learning_date."""
+    start = datetime.strptime(learning_date, "%Y-%m-%d")
+    return [(start + timedelta(days=days)).strftime("%Y-%m-%d") for days in intervals]
+
+
+class ReviewCalendar:
     """
-    Placeholder function for future scheduling logic.
-    Currently returns an empty list or mock data.
+    Review date -> learnings due, with per-date due and completed counts.
+
+    Items are tracked by object: remove() and replace() take the item that was
+    added, and use the dates it had when it was added, so stored items should be
+    replaced rather than edited in place. Ids aren't guaranteed unique.
     """
-    return {"message": "Future scheduling module ready", "plans": []}
+
+    def __init__(self, learnings=()):
+        self._items_by_date = {}  # date -> {item id: [items]}, insertion ordered
+        self._dates = []  # Sorted keys of _items_by_date, for range lookups
+        self._due = {}  # date -> number of items due
+        self._completed = {}  # date -> how many of those are done
+        self._entries = {}  # id(item) -> (item, review dates, completed dates) as added
+        self._items_by_id = {}  # item id -> [items]
+        for item in learnings:
+            self.add(item)
+
+    def add(self, item):
+        dates = list(dict.fromkeys(item.get("recap_dates") or []))
+        completed = set(item.get("completed_dates") or [])
+        self._entries[id(item)] = (item, dates, completed)
+        self._items_by_id.setdefault(item["id"], []).append(item)
+        for date in dates:
+            by_id = self._items_by_date.get(date)
+            if by_id is None:
+                by_id = self._items_by_date[date] = {}
+                bisect.insort(self._dates, date)
+                self._due[date] = 0
+                self._completed[date] = 0
+            by_id.setdefault(item["id"], []).append(item)
+            self._due[date] += 1
+            if date in completed:
+                self._completed[date] += 1
+
+    def remove(self, item):
+        entry = self._entries.pop(id(item), None)
+        if entry is None:
+            return
+        _, dates, completed = entry
+        self._discard(self._items_by_id, item["id"], item)
+        for date in dates:
+            by_id = self._items_by_date[date]
+            self._discard(by_id, item["id"], item)
+            self._due[date] -= 1
+            if date in completed:
+                self._completed[date] -= 1
+            if not by_id:
+                del self._items_by_date[date], self._due[date], self._completed[date]
+                del self._dates[bisect.bisect_left(self._dates, date)]
+
+    @staticmethod
+    def _discard(lists_by_id, item_id, item):
+        items = lists_by_id.get(item_id, [])
+        for i, existing in enumerate(items):
+            if existing is item:
+                del items[i]
+                break
+        if not items:
+            lists_by_id.pop(item_id, None)
+
+    def replace(self, old, new):
+        if old is new:
+            # Edited in place: the entry still has the dates it was added with
+            self.remove(old)
+            self.add(new)
+            return
+        # Adding first keeps the id's place on dates both versions share
+        self.add(new)
+        self.remove(old)
+
+    def remove_id(self, item_id):
+        for item in list(self._items_by_id.get(item_id, [])):
+            self.remove(item)
+
+    def _date_range(self, start, end):
+        lo = bisect.bisect_left(self._dates, start)
+        hi = bisect.bisect_right(self._dates, end)
+        return self._dates[lo:hi]
+
+    def _items_on(self, date):
+        return [item for items in self._items_by_date[date].values() for item in items]
+
+    def between(self, start, end):
+        """Learnings due in [start, end], as {date: [items]} in date order."""
+        return {date: self._items_on(date) for date in self._date_range(start, end)}
+
+    def schedule(self, start, end, include_items=True):
+        """
+        One entry per date in [start, end] with reviews: {"date", "due",
+        "completed"} plus, with include_items, the items as {"id", "content",
+        "completed"}.
+        """
+        days = []
+        for date in self._date_range(start, end):
+            day = {"date": date, "due": self._due[date], "completed": self._completed[date]}
+            if include_items:
+                day["items"] = [
+                    {"id": item["id"], "content": item.get("content"), "completed": date in self._entries[id(item)][2]}
+                    for item in self._items_on(date)
+                ]
+            days.append(day)
+        return days
+
+
+def numpy_available():
+    """Import NumPy if that hasn't happened yet; False if it isn't installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def _day_numbers(dates):
+    """YYYY-MM-DD strings -> int64 days since the epoch."""
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _date_strings(days):
+    return np.datetime_as_string(np.asarray(days).astype("datetime64[D]")).tolist()
+
+
+def reschedule(learnings, today=None):
+    """
+    Grade the reviews that came due since the last run and plan the next one.
+
+    For each learning, the latest review dated up to today that hasn't been
+    graded yet (done, or missed because its date has passed) updates the
+    item's "ease" and "interval" as in SM-2, and its future recap_dates are
+    replaced by a single next review. Items with nothing new to grade are left
+    alone, so running this twice on the same day changes nothing.
+
+    Returns new dicts for the learnings that changed; the input isn't modified.
+    Needs NumPy (RuntimeError otherwise).
+    """
+    if not numpy_available():
+        raise RuntimeError("Adaptive rescheduling needs the numpy package (pip install numpy)")
+    today = today or Date.today().isoformat()
+    if not learnings:
+        return []
+    today_day = _day_numbers([today])[0]
+
+    # Per learning columns
+    learned = _day_numbers([item["date"] for item in learnings])
+    ease = np.array([item.get("ease") or DEFAULT_EASE for item in learnings], dtype=np.float64)
+    interval = np.array([item.get("interval") or 0 for item in learnings], dtype=np.int64)
+    graded = _day_numbers([item.get("graded_through") or item["date"] for item in learnings])
+
+    # Flat (owner, review day) pairs for every review date of every learning
+    recap_lists = [item.get("recap_dates") or [] for item in learnings]
+    owner = np.repeat(np.arange(len(learnings)), [len(dates) for dates in recap_lists])
+    review = _day_numbers([d for dates in recap_lists for d in dates])
+    completed_lists = [item.get("completed_dates") or [] for item in learnings]
+    done_owner = np.repeat(np.arange(len(learnings)), [len(dates) for dates in completed_lists])
+    done_day = _day_numbers([d for dates in completed_lists for d in dates])
+    # One int64 key per pair; day numbers are far below 2**32
+    done = np.isin((owner << 32) + review, (done_owner << 32) + done_day)
+
+    # A review can be graded once it's done, or once its date has passed
+    gradable = (review <= today_day) & (review > graded[owner]) & (done | (review < today_day))
+    latest = np.full(len(learnings), np.iinfo(np.int64).min)
+    np.maximum.at(latest, owner[gradable], review[gradable])
+    changed = latest > np.iinfo(np.int64).min
+    if not changed.any():
+        return []
+    latest_done = np.zeros(len(learnings), dtype=bool)
+    at_latest = gradable & (review == latest[owner])
+    latest_done[owner[at_latest & done]] = True
+
+    # Items without an interval yet start from the gap since their previous review
+    previous = learned.copy()
+    before = review < latest[owner]
+    np.maximum.at(previous, owner[before], review[before])
+    interval = np.where(interval > 0, interval, np.maximum(latest - previous, 1))
+
+    quality = np.where(latest_done, GRADE_ON_TIME, GRADE_MISSED)
+    miss = 5 - quality
+    new_ease = np.maximum(MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+    new_interval = np.where(latest_done, np.minimum(np.rint(interval * new_ease), MAX_INTERVAL), 1).astype(np.int64)
+    next_review = np.where(latest_done, np.maximum(today_day, latest + new_interval), today_day)
+
+    # Back to Python values column by column; indexing NumPy arrays per item is slow
+    rescheduled = []
+    indexes = np.flatnonzero(changed)
+    next_dates = _date_strings(next_review[indexes])
+    latest_dates = _date_strings(latest[indexes])
+    eases = np.round(new_ease[indexes], 2).tolist()
+    intervals = new_interval[indexes].tolist()
+    for i, next_date, graded_through, item_ease, item_interval in zip(
+        indexes.tolist(), next_dates, latest_dates, eases, intervals
+    ):
+        kept = [d for d in recap_lists[i] if d <= today]
+        rescheduled.append({
+            **learnings[i],
+            "recap_dates": list(dict.fromkeys(kept + [next_date])),
+            "ease": item_ease,
+            "interval": item_interval,
+            "graded_through": graded_through,
+        })
+    return rescheduled
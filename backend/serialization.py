@@ -0,0 +1,97 @@
+"""
+Encoding of the data files.
+
+Three formats, picked with STORAGE_FORMAT:
+
+- "json": indented JSON, the original format. Easy to read and edit by hand.
+- "json-compact": JSON without whitespace, written and read with orjson
+  when it is installed (several times faster than the json module).
+- "msgpack": MessagePack, smaller and faster still; needs the msgpack package.
+
+loads() works out the format from the first byte, so files can be switched
+from one format to another without renaming them or changing the setting
+first. `python storage.py convert --format ...` rewrites existing files.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ("json", "json-compact", "msgpack")
+
+
+class DecodeError(ValueError):
+    """The bytes are not a valid document in any supported format."""
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != "msgpack" or msgpack is not None]
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    if fmt == "msgpack" and msgpack is None:
+        raise ValueError("STORAGE_FORMAT=msgpack needs the msgpack package (pip install msgpack)")
+
+
+def dumps(data, fmt="json"):
+    """Encode data as bytes in the given format."""
+    check_format(fmt)
+    if fmt == "msgpack":
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == "json-compact":
+        return dumps_compact(data)
+    return json.dumps(data, indent=4).encode("utf-8")
+
+
+def dumps_compact(data):
+    """Compact JSON bytes; also used for journal lines."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def detect_format(raw):
+    """"json" or "msgpack" for a non-empty encoded document."""
+    # Every JSON document we write is an object or array; MessagePack maps and arrays never start with these bytes
+    return "json" if raw.lstrip()[:1] in (b"{", b"[") else "msgpack"
+
+
+def loads(raw):
+    """Decode bytes written by dumps() in any format. Raises DecodeError."""
+    try:
+        if detect_format(raw) == "msgpack":
+            if msgpack is None:
+                raise DecodeError("File is MessagePack but the msgpack package is not installed")
+            return msgpack.unpackb(raw, raw=False)
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+    except DecodeError:
+        raise
+    except Exception as e:
+        raise DecodeError(str(e)) from e
+
+
+def load_file(path, default):
+    """
+    Decode a data file. An empty file gives default(); one that doesn't decode
+    raises DecodeError naming the file, rather than being taken for empty data
+    that the next write would save over it.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if not raw.strip():
+        return default()
+    try:
+        return loads(raw)
+    except DecodeError as e:
+        raise DecodeError(f"Can't read {path} as {detect_format(raw)}: {e}") from e
@@ -0,0 +1,2069 @@
+"""
+Storage backends for learnings and planning data.
+
+Two backends implement the same interface:
+
+- JsonStorage keeps everything in data/learning_data.json and
+  data/planning_data.json (the original format).
+- SqliteStorage keeps one row per learning / plan / task group, so single-item
+  updates don't rewrite the whole dataset.
+
+Parsed JSON documents are kept in memory and written through on save, so read
+endpoints don't have to re-parse the whole file on every request. Each cached
+document remembers the mtime/size of the file it was read from; if the file
+changes on disk (e.g. edited by hand), the next load re-reads it.
+
+JSON writes go through a GroupCommitWriter: mutations run one at a time on a
+single writer thread, and the files they touch are written once per burst of
+edits (temp file + fsync + rename) rather than once per edit.
+
+Several processes (uvicorn --workers N) can share one data directory. Each
+commit holds an exclusive flock on data/storage.lock, and every cache checks
+the files it was read from (or the version stamp files next to them) before
+reuse, so a worker picks up another worker's writes on its next access.
+
+The JSON backend's files can also be stored compactly or as MessagePack
+(see serialization.py); `python storage.py convert --format ...` rewrites
+existing files.
+
+Run `python storage.py migrate` to copy the JSON files into a SQLite database.
+
+Data file reads and writes are timed and sized into the storage_file_*
+histograms; main.py wraps the store in InstrumentedStorage to time each call.
+"""
+import argparse
+import bisect
+import contextlib
+import functools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+import scheduler
+import serialization
+
+FILE_SECONDS = metrics.histogram(
+    "storage_file_duration_seconds",
+    "Time spent reading and decoding, or encoding and writing, a data file",
+    ["file", "operation"],
+)
+FILE_BYTES = metrics.histogram(
+    "storage_file_bytes", "Bytes read from or written to a data file", ["file", "operation"],
+    buckets=metrics.BYTE_BUCKETS,
+)
+OPERATION_SECONDS = metrics.histogram(
+    "storage_operation_duration_seconds", "Time spent in a storage call", ["backend", "operation"],
+)
+
+
+def record_file_io(path, operation, started, size):
+    name = os.path.basename(path)
+    FILE_SECONDS.observe(time.perf_counter() - started, name, operation)
+    FILE_BYTES.observe(size, name, operation)
+
+try:
+    import fcntl
+except ImportError:  # Windows: FileLock only excludes threads of this process
+    fcntl = None
+
+
+class FileLock:
+    """
+    An exclusive lock shared by every process that opens the same path,
+    re-entrant within a thread. The lock file is opened on first use, after
+    any fork, so each worker process gets its own flock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+        self._owner = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            if self._fd is None:
+                directory = os.path.dirname(self.path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        self._owner = threading.get_ident()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def held(self):
+        """True if the calling thread holds the lock."""
+        return self._owner == threading.get_ident()
+
+
+class GroupCommitWriter:
+    """
+    Runs mutations one at a time on a dedicated thread and commits them in groups.
+
+    submit(fn) queues fn and blocks until it has run and everything it changed
+    is on disk. Files and counters created with writer=... don't write when
+    saved from the writer thread; they call mark_dirty() and are flushed once
+    the queue has been quiet for `window` seconds (or max_batch mutations have
+    run), after which every caller in the group is released.
+    """
+
+    def __init__(self, window=0.002, max_batch=256, lock=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.lock = lock  # Held while a group runs and commits, e.g. a FileLock
+        self._queue = queue.Queue()
+        self._dirty = {}  # id(obj) -> obj, flushed in the order first touched
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.groups = 0
+        self.mutations = 0
+
+    def in_writer(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn):
+        if self.in_writer():
+            # Nested call from a mutation that's already running
+            return fn()
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        return future.result()
+
+    def mark_dirty(self, obj):
+        """Called by a file or counter changed on the writer thread; obj.flush() runs at commit."""
+        self._dirty.setdefault(id(obj), obj)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Commit whatever is queued and stop the thread; the next submit() starts a new one."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+        with self._start_lock:
+            self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            task = self._queue.get()
+            if task is None:
+                break
+            group = [task]
+            deadline = time.monotonic() + self.window
+            while len(group) < self.max_batch:
+                try:
+                    task = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if task is None:
+                    stopping = True
+                    break
+                group.append(task)
+            self._commit(group)
+
+    def _commit(self, group):
+        outcomes = []
+        flush_error = None
+        with self.lock or contextlib.nullcontext():
+            for fn, future in group:
+                try:
+                    outcomes.append((future, fn(), None))
+                except BaseException as e:
+                    outcomes.append((future, None, e))
+
+            dirty, self._dirty = list(self._dirty.values()), {}
+            for obj in dirty:
+                try:
+                    obj.flush()
+                except Exception as e:
+                    flush_error = flush_error or e
+        self.groups += 1
+        self.mutations += len(group)
+
+        for future, result, error in outcomes:
+            error = error or flush_error
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def serialized(method):
+    """Run a storage method on the instance's GroupCommitWriter and wait for it to commit."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.writer.submit(lambda: method(self, *args, **kwargs))
+
+    return wrapper
+
+
+class CachedJsonFile:
+    """
+    A JSON document on disk with an in-memory, write-through cache.
+
+    load() returns the cached object itself, not a copy. Callers that mutate
+    it are expected to pass it back to save(). With a writer, a save made on
+    the writer thread only updates memory and the file is written at commit.
+    Files are written in `fmt` and read in whatever format they're in.
+
+    With a version counter (bumped after every save, see VersionCounter), the
+    cache is only trusted while the counter is unchanged, so saves by other
+    processes are seen even when the file's stat looks the same. The stat is
+    still compared to catch edits made by hand.
+    """
+
+    def __init__(self, path, default, writer=None, fmt="json", version=None):
+        self.path = path
+        self.default = default  # Callable returning an empty document
+        self.writer = writer
+        self.fmt = fmt
+        self.version = version
+        self._data = None
+        self._signature = None
+        self._version = None  # The counter's value when _data was read or written
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # Every save is a rename, so the inode changes even if mtime and size don't
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with self._lock:
+            if self._dirty:
+                return self._data
+            # Counter first: it is written after the file, so the file is at least this new
+            version = self.version.get() if self.version is not None else None
+            signature = self._stat_signature()
+            if signature is None:
+                self._data = None
+                self._signature = None
+                return self.default()
+            if self._data is not None and signature == self._signature and version == self._version:
+                return self._data
+
+            started = time.perf_counter()
+            data = serialization.load_file(self.path, self.default)
+            record_file_io(self.path, "read", started, signature[2])
+            self._data = data
+            self._signature = signature
+            self._version = version
+            return data
+
+    def save(self, data):
+        with self._lock:
+            self._data = data
+            if self.writer is not None and self.writer.in_writer():
+                self._dirty = True
+                self.writer.mark_dirty(self)
+                return
+            self._write_locked()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write_locked()
+
+    def _write_locked(self):
+        # Ensure directory exists before saving
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        started = time.perf_counter()
+        raw = serialization.dumps(self._data, self.fmt)
+        write_atomic(self.path, raw)
+        record_file_io(self.path, "write", started, len(raw))
+        self._dirty = False
+        self._signature = self._stat_signature()
+        # At commit the bump that goes with this save is already counted (it is flushed next);
+        # otherwise this is the old value and the next load re-reads once
+        self._version = self.version.get() if self.version is not None else None
+
+    def exists(self):
+        return self._dirty or os.path.exists(self.path)
+
+    def invalidate(self):
+        """Drop the cached document so the next load re-reads the file."""
+        with self._lock:
+            if self._dirty:
+                self._write_locked()
+            self._data = None
+            self._signature = None
+            self._version = None
+
+
+def is_task_group_type(plan_type):
+    """taskGroups, monthlyTaskGroups, ... hold TaskGroup records rather than Plans."""
+    return plan_type.lower().endswith("taskgroups")
+
+
+class ItemNotFound(LookupError):
+    """A batch operation referenced a plan item that doesn't exist."""
+
+
+class VersionConflict(Exception):
+    """The planning data changed since the version a client based its edits on."""
+
+    def __init__(self, current_version):
+        super().__init__(f"Planning data is at version {current_version}")
+        self.current_version = current_version
+
+
+class VersionCounter:
+    """
+    A monotonically increasing counter persisted in a small sidecar file. Used
+    for the data versions and for new ids (see Storage.allocate_id).
+
+    The file is the shared version stamp between worker processes, so get()
+    reads it every time rather than trusting its stat: inode numbers are
+    reused and mtimes are coarse, so a changed file can look unchanged.
+    bump() and advance_to() must run under the storage FileLock when several
+    processes share the file.
+    """
+
+    def __init__(self, path, writer=None):
+        self.path = path
+        self.writer = writer  # As for CachedJsonFile: bumps on the writer thread are written at commit
+        self._lock = threading.Lock()
+        self._value = 0
+        self._dirty = False
+        self._refresh()
+
+    def _refresh(self):
+        if self._dirty:
+            return
+        try:
+            with open(self.path, "r") as f:
+                self._value = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def get(self):
+        with self._lock:
+            self._refresh()
+            return self._value
+
+    def bump(self):
+        with self._lock:
+            self._refresh()
+            if self.writer is not None and self.writer.in_writer():
+                self._value += 1
+                self._dirty = True
+                self.writer.mark_dirty(self)
+            else:
+                self._write(self._value + 1)
+            return self._value
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write(self._value)
+
+    def advance_to(self, value):
+        """Raise the counter to `value` if it is lower."""
+        with self._lock:
+            self._refresh()
+            if value > self._value:
+                self._write(value)
+            return self._value
+
+    def _write(self, value):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(value))
+        os.replace(tmp_path, self.path)
+        self._value = value
+        self._dirty = False
+
+
+def resolve_plan_ops(get_items, ops, find=None):
+    """
+    Check a batch of operations against the current data and turn them into
+    journal records (see apply_plan_op), without mutating anything.
+
+    ops are {"op": "add", "type", "item"}, {"op": "update", "type", "id",
+    "updates"} or {"op": "delete", "type", "id"}; later operations see the
+    effect of earlier ones. get_items(plan_type) returns the current list and
+    find(plan_type, items, item_id) the position of an id in it (see IdIndex;
+    without it the list is scanned). Only the items the batch touches are
+    looked up and copied, so the cost grows with the batch, not the lists.
+
+    Returns (records, results): the journal records, and per operation the
+    resulting item (None for deletes). Raises ItemNotFound if an update or
+    delete misses.
+    """
+    # plan_type -> {id: the item as this batch left it, or None once deleted}
+    overlays = {}
+    records = []
+    results = []
+
+    def current(plan_type, item_id):
+        overlay = overlays.setdefault(plan_type, {})
+        if item_id in overlay:
+            return overlay[item_id]
+        items = get_items(plan_type)
+        if find is not None:
+            position = find(plan_type, items, item_id)
+        else:
+            position = next((i for i, item in enumerate(items) if item.get("id") == item_id), None)
+        return None if position is None else items[position]
+
+    for op in ops:
+        plan_type = op["type"]
+        kind = op["op"]
+        if kind == "add":
+            item = op["item"]
+            # Lookups find the first item with an id, so an added duplicate stays hidden
+            if current(plan_type, item.get("id")) is None:
+                overlays[plan_type][item.get("id")] = item
+            records.append({"op": "add", "type": plan_type, "item": item})
+            results.append(item)
+        elif kind == "update":
+            existing = current(plan_type, op["id"])
+            if existing is None:
+                raise ItemNotFound(f"Item '{op['id']}' not found in {plan_type}")
+            item = {**existing, **(op.get("updates") or {})}
+            if item.get("id") != op["id"]:
+                overlays[plan_type][op["id"]] = None
+                # Lookups keep finding an earlier item that already has the new id
+                if current(plan_type, item.get("id")) is None:
+                    overlays[plan_type][item.get("id")] = item
+            else:
+                overlays[plan_type][op["id"]] = item
+            records.append({"op": "update", "type": plan_type, "id": op["id"], "item": item})
+            results.append(item)
+        elif kind == "delete":
+            if current(plan_type, op["id"]) is None:
+                raise ItemNotFound(f"Item '{op['id']}' not found in {plan_type}")
+            # apply_plan_op removes every item with the id
+            overlays[plan_type][op["id"]] = None
+            records.append({"op": "delete", "type": plan_type, "id": op["id"]})
+            results.append(None)
+        else:
+            raise ValueError(f"Unknown operation '{kind}'")
+    return records, results
+
+
+def sort_key(item):
+    """Pagination order: by date, then id. Missing values sort first."""
+    date = item.get("date")
+    item_id = item.get("id")
+    return ("" if date is None else str(date), "" if item_id is None else str(item_id))
+
+
+# Sorts after any real id, so (date, MAX_KEY) bounds every item on that date
+MAX_KEY = "\U0010ffff"
+
+
+class SortedIndex:
+    """Items ordered by sort_key, for date-range scans and cursor pagination."""
+
+    def __init__(self, items):
+        self._items = sorted(items, key=sort_key)
+        self._keys = [sort_key(item) for item in self._items]
+
+    def page(self, start=None, end=None, after=None, limit=None):
+        """
+        Items with start <= date <= end, beginning after the (date, id) cursor.
+        Returns (items, cursor of the last item if there are more, else None).
+        """
+        lo = bisect.bisect_left(self._keys, (start,)) if start else 0
+        if after is not None:
+            lo = max(lo, bisect.bisect_right(self._keys, tuple(after)))
+        hi = bisect.bisect_right(self._keys, (end, MAX_KEY)) if end else len(self._keys)
+        if limit is None or lo + limit >= hi:
+            return self._items[lo:hi], None
+        return self._items[lo:lo + limit], self._keys[lo + limit - 1]
+
+
+class IdIndex:
+    """
+    Position of each id in one list of items, so point lookups don't scan.
+
+    The index belongs to the list object it was built from and is rebuilt when
+    handed a different one, so lists that get replaced (reloads, deletes,
+    replace_plan_type) need no bookkeeping. Appends are picked up on the next
+    miss (or recorded with appended()); any other in-place change must call
+    invalidate(). Where ids repeat, the first occurrence wins, as it would for
+    a scan.
+    """
+
+    def __init__(self):
+        self._source = None
+        self._positions = {}
+        self._indexed = 0
+
+    def find(self, items, item_id):
+        """Position of the first item with item_id in items, or None."""
+        if items is not self._source:
+            self._rebuild(items)
+        position = self._positions.get(item_id)
+        if position is not None and (position >= len(items) or items[position].get("id") != item_id):
+            # Changed behind our back; cheap to detect, so recover rather than trust it
+            self._rebuild(items)
+            position = self._positions.get(item_id)
+        elif position is None and len(items) > self._indexed:
+            self._index_tail(items)
+            position = self._positions.get(item_id)
+        return position
+
+    def _rebuild(self, items):
+        self._positions = {}
+        self._indexed = 0
+        self._source = items
+        self._index_tail(items)
+
+    def _index_tail(self, items):
+        for i in range(self._indexed, len(items)):
+            self._positions.setdefault(items[i].get("id"), i)
+        self._indexed = len(items)
+
+    def appended(self, items):
+        """Record that an item was appended to items."""
+        if items is self._source and self._indexed == len(items) - 1:
+            self._index_tail(items)
+
+    def invalidate(self):
+        self._source = None
+        self._positions = {}
+        self._indexed = 0
+
+
+def highest_numeric_id(items):
+    return max((int(item["id"]) for item in items if str(item.get("id", "")).isdigit()), default=0)
+
+
+class Storage:
+    """
+    Interface shared by the storage backends.
+
+    Subclasses must implement the four whole-document methods. The point
+    operations below are written in terms of those, which is all a flat file
+    can do; backends that can touch a single record override them.
+    """
+
+    def __init__(self, planning_default):
+        self.planning_default = planning_default  # Callable returning empty PlanningData dict
+
+    # Whole documents
+
+    def load_learnings(self):
+        raise NotImplementedError
+
+    def save_learnings(self, data):
+        raise NotImplementedError
+
+    def load_planning(self):
+        raise NotImplementedError
+
+    def save_planning(self, data):
+        raise NotImplementedError
+
+    def initialize(self):
+        """Create empty storage if nothing exists yet."""
+
+    def prewarm(self):
+        """Load data into memory ahead of the first request. Safe to call from a background thread."""
+
+    def shutdown(self):
+        """Flush anything buffered before the process exits."""
+
+    # Ids
+
+    def allocate_id(self, taken=None):
+        """
+        A fresh id from a persistent counter, so ids are never reused after a
+        delete. The counter starts above the highest numeric learning id.
+        taken(id) says whether an id is already in use where the new item is
+        going (by default: by a learning); such ids are skipped.
+        """
+        if taken is None:
+            taken = lambda item_id: self.get_learning(item_id) is not None
+        while True:
+            item_id = str(self._next_id())
+            if not taken(item_id):
+                return item_id
+
+    def _next_id(self):
+        raise NotImplementedError
+
+    def reserve_ids(self, value):
+        """Make sure allocate_id never returns `value` or anything below it."""
+        raise NotImplementedError
+
+    # Learnings
+
+    def get_learning(self, item_id):
+        for item in self.load_learnings():
+            if item["id"] == item_id:
+                return item
+        return None
+
+    def add_learning(self, item):
+        data = self.load_learnings()
+        data.append(item)
+        self.save_learnings(data)
+
+    def update_learning(self, item):
+        data = self.load_learnings()
+        for i, existing in enumerate(data):
+            if existing["id"] == item["id"]:
+                data[i] = item
+                self.save_learnings(data)
+                return True
+        return False
+
+    def modify_learning(self, item_id, change):
+        """
+        Replace a learning with change(item) as a single step, so concurrent
+        edits can't overwrite each other. change must return a new dict rather
+        than edit the one it's given. Returns the new item, or None if missing.
+        """
+        item = self.get_learning(item_id)
+        if item is None:
+            return None
+        item = change(item)
+        self.update_learning(item)
+        return item
+
+    def modify_learnings(self, change):
+        """
+        Replace many learnings in one write. change(learnings) returns new
+        dicts for the items to replace, matched by id. Returns how many.
+        """
+        data = self.load_learnings()
+        replacements = {item["id"]: item for item in change(data)}
+        if replacements:
+            self.save_learnings([replacements.get(item["id"], item) for item in data])
+        return len(replacements)
+
+    def delete_learning(self, item_id):
+        data = self.load_learnings()
+        new_data = [item for item in data if item["id"] != item_id]
+        if len(new_data) == len(data):
+            return False
+        self.save_learnings(new_data)
+        return True
+
+    def page_learnings(self, start=None, end=None, after=None, limit=None):
+        """A page of learnings in (date, id) order; see SortedIndex.page."""
+        return SortedIndex(self.load_learnings()).page(start, end, after, limit)
+
+    def reminders_between(self, start, end):
+        """Learnings with a recap date in [start, end], as {date: [items]} in date order."""
+        reminders = {}
+        for item in self.load_learnings():
+            for date in item.get("recap_dates") or []:
+                if start <= date <= end:
+                    reminders.setdefault(date, []).append(item)
+        return dict(sorted(reminders.items()))
+
+    def review_schedule(self, start, end, include_items=True):
+        """Per-date review counts (and items) in [start, end]; see ReviewCalendar.schedule."""
+        return scheduler.ReviewCalendar(self.load_learnings()).schedule(start, end, include_items)
+
+    # Planning
+
+    def plan_types(self):
+        return list(self.load_planning().keys())
+
+    def load_plan_type(self, plan_type):
+        return self.load_planning()[plan_type]
+
+    def page_plan_type(self, plan_type, start=None, end=None, after=None, limit=None):
+        """A page of one planning type in (date, id) order; see SortedIndex.page."""
+        return SortedIndex(self.load_plan_type(plan_type)).page(start, end, after, limit)
+
+    def get_plan_item(self, plan_type, item_id):
+        for item in self.load_planning()[plan_type]:
+            if item.get("id") == item_id:
+                return item
+        return None
+
+    def add_plan_item(self, plan_type, item):
+        data = self.load_planning()
+        data[plan_type].append(item)
+        self.save_planning(data)
+
+    def update_plan_item(self, plan_type, item_id, item):
+        data = self.load_planning()
+        items = data[plan_type]
+        for i, existing in enumerate(items):
+            if existing.get("id") == item_id:
+                items[i] = item
+                self.save_planning(data)
+                return True
+        return False
+
+    def modify_plan_item(self, plan_type, item_id, change):
+        """As modify_learning, for one planning type; change may also change the id."""
+        item = self.get_plan_item(plan_type, item_id)
+        if item is None:
+            return None
+        item = change(item)
+        self.update_plan_item(plan_type, item_id, item)
+        return item
+
+    def delete_plan_item(self, plan_type, item_id):
+        data = self.load_planning()
+        original_count = len(data[plan_type])
+        data[plan_type] = [item for item in data[plan_type] if item.get("id") != item_id]
+        if len(data[plan_type]) == original_count:
+            return False
+        self.save_planning(data)
+        return True
+
+    def replace_plan_type(self, plan_type, items):
+        data = self.load_planning()
+        data[plan_type] = items
+        self.save_planning(data)
+
+    def planning_version(self):
+        """Increases with every change to the planning data."""
+        raise NotImplementedError
+
+    def version_token(self, collection):
+        """
+        A short string that changes whenever "learnings" or "planning" changes,
+        cheap enough to compute on every request (used for ETags).
+        """
+        raise NotImplementedError
+
+    def apply_plan_ops(self, ops, base_version=None):
+        """
+        Apply a batch of operations (see resolve_plan_ops) in a single write and
+        return (new version, per-operation results). All or nothing: raises
+        ItemNotFound, or VersionConflict if base_version is given and stale.
+        """
+        if base_version is not None and base_version != self.planning_version():
+            raise VersionConflict(self.planning_version())
+        data = self.load_planning()
+        records, results = resolve_plan_ops(lambda plan_type: data[plan_type], ops)
+        apply_plan_records(data, records)
+        self.save_planning(data)
+        return self.planning_version(), results
+
+
+class JsonStorage(Storage):
+    """
+    The original two-file JSON layout, with an in-memory cache per file.
+
+    Every mutation runs on the writer thread (see GroupCommitWriter), so
+    concurrent requests are applied in order instead of overwriting each other.
+    """
+
+    def __init__(self, data_file, planning_file, planning_default, commit_window=0.002, fmt="json"):
+        super().__init__(planning_default)
+        serialization.check_format(fmt)
+        self.process_lock = FileLock(os.path.join(os.path.dirname(data_file), "storage.lock"))
+        self.writer = GroupCommitWriter(commit_window, lock=self.process_lock)
+        self.learnings_version_counter = VersionCounter(data_file + ".version", self.writer)
+        self.planning_version_counter = VersionCounter(planning_file + ".version", self.writer)
+        self.learning_file = CachedJsonFile(data_file, list, self.writer, fmt, self.learnings_version_counter)
+        self.planning_file = CachedJsonFile(
+            planning_file, planning_default, self.writer, fmt, self.planning_version_counter
+        )
+        self.id_counter = VersionCounter(data_file + ".ids")
+        self._ids_seeded = False
+        self._learning_ids = IdIndex()
+        self._plan_ids = {}  # plan_type -> IdIndex
+        self._calendar = None
+        self._calendar_source = None  # The learnings list the calendar was built from
+        self._sorted_indexes = {}  # (collection, plan_type) -> (version token, SortedIndex)
+        self._index_lock = threading.RLock()
+
+    def initialize(self):
+        if not self.learning_file.exists():
+            self.save_learnings([])
+        if not self.planning_file.exists():
+            self.save_planning(self.planning_default())
+
+    def shutdown(self):
+        self.writer.stop()
+
+    def prewarm(self):
+        # Requests arriving meanwhile wait on the files' locks rather than parsing them again
+        self.load_learnings()
+        self.load_planning()
+
+    def load_learnings(self):
+        return self.learning_file.load()
+
+    @serialized
+    def save_learnings(self, data):
+        # A whole-document save may have edited the cached list in place, so nothing built from it holds
+        with self._index_lock:
+            self._learning_ids.invalidate()
+            self._calendar = None
+            self._calendar_source = None
+            self._write_learnings(data)
+
+    def _write_learnings(self, data):
+        # For point operations that keep _learning_ids current themselves
+        self.learning_file.save(data)
+        self.learnings_version_counter.bump()
+
+    def _next_id(self):
+        with self.process_lock:
+            if not self._ids_seeded:
+                self.id_counter.advance_to(highest_numeric_id(self.load_learnings()))
+                self._ids_seeded = True
+            return self.id_counter.bump()
+
+    def reserve_ids(self, value):
+        with self.process_lock:
+            self.id_counter.advance_to(value)
+
+    def get_learning(self, item_id):
+        with self._index_lock:
+            data = self.load_learnings()
+            position = self._learning_ids.find(data, item_id)
+            return None if position is None else data[position]
+
+    def _calendar_for(self, data):
+        # Rebuilt whenever the cache hands back a different list (file reloaded or replaced)
+        if self._calendar is None or self._calendar_source is not data:
+            self._calendar = scheduler.ReviewCalendar(data)
+            self._calendar_source = data
+        return self._calendar
+
+    @serialized
+    def add_learning(self, item):
+        with self._index_lock:
+            data = self.load_learnings()
+            calendar = self._calendar_for(data)
+            data.append(item)
+            self._learning_ids.appended(data)
+            self._write_learnings(data)
+            calendar.add(item)
+            self._calendar_source = self.load_learnings()
+
+    @serialized
+    def update_learning(self, item):
+        with self._index_lock:
+            data = self.load_learnings()
+            calendar = self._calendar_for(data)
+            position = self._learning_ids.find(data, item["id"])
+            if position is None:
+                return False
+            existing = data[position]
+            data[position] = item
+            self._write_learnings(data)
+            calendar.replace(existing, item)
+            self._calendar_source = self.load_learnings()
+            return True
+
+    @serialized
+    def delete_learning(self, item_id):
+        with self._index_lock:
+            data = self.load_learnings()
+            calendar = self._calendar_for(data)
+            remaining = [item for item in data if item["id"] != item_id]
+            if len(remaining) == len(data):
+                return False
+            # A new list, so the id index rebuilds itself; the calendar is updated instead
+            self._write_learnings(remaining)
+            calendar.remove_id(item_id)
+            self._calendar_source = self.load_learnings()
+            return True
+
+    def reminders_between(self, start, end):
+        with self._index_lock:
+            return self._calendar_for(self.load_learnings()).between(start, end)
+
+    def review_schedule(self, start, end, include_items=True):
+        with self._index_lock:
+            return self._calendar_for(self.load_learnings()).schedule(start, end, include_items)
+
+    def _sorted_index(self, collection, plan_type, load_items):
+        # Rebuilt lazily after any write, then every page is a bisect and a slice
+        token = self.version_token(collection)
+        cached = self._sorted_indexes.get((collection, plan_type))
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        index = SortedIndex(load_items())
+        self._sorted_indexes[(collection, plan_type)] = (token, index)
+        return index
+
+    def page_learnings(self, start=None, end=None, after=None, limit=None):
+        index = self._sorted_index("learnings", None, self.load_learnings)
+        return index.page(start, end, after, limit)
+
+    def page_plan_type(self, plan_type, start=None, end=None, after=None, limit=None):
+        index = self._sorted_index("planning", plan_type, lambda: self.load_plan_type(plan_type))
+        return index.page(start, end, after, limit)
+
+    def load_planning(self):
+        return self.planning_file.load()
+
+    @serialized
+    def save_planning(self, data):
+        self._invalidate_plan_ids()
+        self._write_planning(data)
+
+    def _write_planning(self, data):
+        self.planning_file.save(data)
+        self.planning_version_counter.bump()
+
+    def _plan_index(self, plan_type):
+        index = self._plan_ids.get(plan_type)
+        if index is None:
+            index = self._plan_ids[plan_type] = IdIndex()
+        return index
+
+    def _find_plan(self, plan_type, items, item_id):
+        return self._plan_index(plan_type).find(items, item_id)
+
+    def _invalidate_plan_ids(self, plan_types=None):
+        for plan_type in self._plan_ids if plan_types is None else plan_types:
+            self._plan_index(plan_type).invalidate()
+
+    def get_plan_item(self, plan_type, item_id):
+        # Loaded before taking the index lock: the journal's lock is always taken first
+        items = self.load_planning()[plan_type]
+        with self._index_lock:
+            position = self._find_plan(plan_type, items, item_id)
+            return None if position is None else items[position]
+
+    @serialized
+    def add_plan_item(self, plan_type, item):
+        with self._index_lock:
+            data = self.load_planning()
+            data[plan_type].append(item)
+            self._plan_index(plan_type).appended(data[plan_type])
+            self._write_planning(data)
+
+    @serialized
+    def update_plan_item(self, plan_type, item_id, item):
+        with self._index_lock:
+            data = self.load_planning()
+            items = data[plan_type]
+            position = self._find_plan(plan_type, items, item_id)
+            if position is None:
+                return False
+            items[position] = item
+            if item.get("id") != item_id:
+                self._invalidate_plan_ids([plan_type])
+            self._write_planning(data)
+            return True
+
+    @serialized
+    def modify_learning(self, item_id, change):
+        return super().modify_learning(item_id, change)
+
+    @serialized
+    def modify_learnings(self, change):
+        # In place, so the id index and calendar are updated rather than rebuilt
+        with self._index_lock:
+            data = self.load_learnings()
+            calendar = self._calendar_for(data)
+            replaced = change(data)
+            for item in replaced:
+                position = self._learning_ids.find(data, item["id"])
+                if position is not None:
+                    calendar.replace(data[position], item)
+                    data[position] = item
+            if replaced:
+                self._write_learnings(data)
+                self._calendar_source = self.load_learnings()
+            return len(replaced)
+
+    @serialized
+    def modify_plan_item(self, plan_type, item_id, change):
+        return super().modify_plan_item(plan_type, item_id, change)
+
+    @serialized
+    def delete_plan_item(self, plan_type, item_id):
+        return super().delete_plan_item(plan_type, item_id)
+
+    @serialized
+    def replace_plan_type(self, plan_type, items):
+        super().replace_plan_type(plan_type, items)
+
+    @serialized
+    def apply_plan_ops(self, ops, base_version=None):
+        if base_version is not None and base_version != self.planning_version():
+            raise VersionConflict(self.planning_version())
+        with self._index_lock:
+            data = self.load_planning()
+            records, results = resolve_plan_ops(lambda plan_type: data[plan_type], ops, self._find_plan)
+            # Keeps the id indexes current, so the next lookup doesn't rebuild them
+            apply_plan_records(data, records, self._plan_index)
+            self._write_planning(data)
+        return self.planning_version(), results
+
+    def planning_version(self):
+        return self.planning_version_counter.get()
+
+    def _version_files(self, collection):
+        if collection == "learnings":
+            return self.learnings_version_counter, [self.learning_file.path]
+        return self.planning_version_counter, [self.planning_file.path]
+
+    def version_token(self, collection):
+        # The counter covers our own writes; the file stats catch edits made by hand
+        counter, paths = self._version_files(collection)
+        parts = [str(counter.get())]
+        for path in paths:
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_mtime_ns:x}.{st.st_size:x}")
+            except FileNotFoundError:
+                parts.append("0")
+        return "-".join(parts)
+
+
+def apply_plan_op(data, op, index=None):
+    """
+    Apply one journal record to a planning document in place.
+
+    index(plan_type) gives the IdIndex that finds the item for an update (see
+    JsonStorage._plan_index). It is kept current rather than rebuilt: adds are
+    recorded and only a rename invalidates it; deletes and replaces put a new
+    list in place, which the index notices itself. Without an index an update
+    scans the list.
+    """
+    plan_type = op["type"]
+    items = data.setdefault(plan_type, [])
+    kind = op["op"]
+    if kind == "add":
+        items.append(op["item"])
+        if index is not None:
+            index(plan_type).appended(items)
+    elif kind == "update":
+        item = op["item"]
+        # "id" is the id before the update, in case the update changed it
+        item_id = op.get("id", item.get("id"))
+        if index is not None:
+            position = index(plan_type).find(items, item_id)
+        else:
+            position = next((i for i, existing in enumerate(items) if existing.get("id") == item_id), None)
+        if position is not None:
+            items[position] = item
+            if index is not None and item.get("id") != item_id:
+                index(plan_type).invalidate()
+    elif kind == "delete":
+        _remove_plan_ids(data, plan_type, {op["id"]})
+    elif kind == "replace":
+        data[plan_type] = op["items"]
+
+
+def apply_plan_records(data, records, index=None):
+    """
+    apply_plan_op for each record in order, except that deletes are held back
+    until something else touches their plan type, so a run of them costs one
+    pass over the list instead of one each.
+    """
+    deleting = {}  # plan_type -> ids still to remove
+    for record in records:
+        plan_type = record["type"]
+        if record["op"] == "delete":
+            deleting.setdefault(plan_type, set()).add(record["id"])
+            continue
+        if plan_type in deleting:
+            _remove_plan_ids(data, plan_type, deleting.pop(plan_type))
+        apply_plan_op(data, record, index)
+    for plan_type, ids in deleting.items():
+        _remove_plan_ids(data, plan_type, ids)
+
+
+def _remove_plan_ids(data, plan_type, ids):
+    data[plan_type] = [item for item in data.setdefault(plan_type, []) if item.get("id") not in ids]
+
+
+def write_atomic(path, raw):
+    """Write bytes to a temp file, fsync, then rename over the target."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class PlanningJournal:
+    """
+    Planning data as a snapshot file plus an append-only operation log.
+
+    Each mutation appends one small JSON line to <planning_file>.log instead of
+    rewriting the whole document; the in-memory state is the snapshot with the
+    log replayed on top. compact() folds the log into a new snapshot and is run
+    periodically by a background thread (see start_compactor()).
+
+    Compaction rotates the log to <planning_file>.log.1 and builds the new
+    snapshot from the old one plus that rotated log, so writes (in any
+    process) continue meanwhile; the process lock is only held to rotate and
+    to swap the snapshot in. Loads replay the rotated log on top of the old
+    snapshot, and one left behind by a compaction that died midway is folded
+    in by the next compact().
+
+    The swap commits by renaming the rotated log to <planning_file>.log.folded
+    once the new snapshot is on disk (as <planning_file>.compact.tmp). After a
+    crash, the marker says the rotated records are in the new snapshot: the
+    next load finishes the swap if it hadn't happened yet, and never replays
+    those records again.
+
+    A crash mid-append can leave a torn last line in the log. Loading cuts the
+    log back to the end of the last complete record, so later appends don't
+    land on the torn line and get lost with it.
+
+    Every append and save bumps `version` (a VersionCounter, by default
+    <planning_file>.version) under the process lock, and the in-memory state
+    is only reused while the counter still has the value it was read at.
+    Compaction doesn't change the data, so it leaves the counter alone.
+    """
+
+    def __init__(
+        self, snapshot_path, default, compact_interval=30.0, max_log_records=1000, index=None, writer=None,
+        process_lock=None, fmt="json", version=None,
+    ):
+        self.snapshot_path = snapshot_path
+        self.fmt = fmt  # Snapshot format, see serialization.py
+        self.index = index  # Passed to apply_plan_op for live updates
+        self.writer = writer  # Appends made on its thread are buffered and written at commit
+        # Shared with other processes: held for reloads and compaction, always before _lock
+        self.process_lock = process_lock
+        # Held for a whole compaction (before process_lock), so only one process compacts at a time
+        self.compaction_lock = FileLock(snapshot_path + ".compact.lock") if process_lock is not None else None
+        self._pending = []  # Buffered log lines
+        self.log_path = snapshot_path + ".log"
+        self.rotated_log_path = snapshot_path + ".log.1"
+        self.folded_log_path = snapshot_path + ".log.folded"
+        self.compact_tmp_path = snapshot_path + ".compact.tmp"
+        self.default = default
+        self.compact_interval = compact_interval
+        self.max_log_records = max_log_records
+        self.version = version if version is not None else VersionCounter(snapshot_path + ".version", writer)
+        self._data = None
+        self._version = None  # The counter's value that _data reflects
+        self._log_records = 0
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def _size(self):
+        return sum(os.path.getsize(path) for path in (self.snapshot_path, self.rotated_log_path, self.log_path)
+                   if os.path.exists(path))
+
+    def _read_log(self, path):
+        """The records in a log, and the offset just past the last complete one."""
+        records = []
+        end = 0
+        if not os.path.exists(path):
+            return records, end
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A torn final line from a crash mid-append; it was never acknowledged
+                    break
+                if line.strip():
+                    try:
+                        records.append(serialization.loads(line))
+                    except serialization.DecodeError:
+                        break
+                end += len(line)
+        return records, end
+
+    def _read_snapshot(self):
+        if os.path.exists(self.snapshot_path):
+            return serialization.load_file(self.snapshot_path, self.default)
+        return self.default()
+
+    def _recover(self):
+        """Finish a snapshot swap that a crash interrupted after its commit point."""
+        if os.path.exists(self.folded_log_path):
+            if os.path.exists(self.compact_tmp_path):
+                os.replace(self.compact_tmp_path, self.snapshot_path)
+            os.remove(self.folded_log_path)
+
+    def _read(self):
+        """Snapshot plus logs; cuts a torn tail off the log (callers hold the process lock)."""
+        self._recover()
+        data = self._read_snapshot()
+        apply_plan_records(data, self._read_log(self.rotated_log_path)[0])
+        records, end = self._read_log(self.log_path)
+        apply_plan_records(data, records)
+        truncated = os.path.exists(self.log_path) and os.path.getsize(self.log_path) > end
+        if truncated:
+            os.truncate(self.log_path, end)
+        return data, len(records), truncated
+
+    def load(self):
+        with self._lock:
+            if self._pending or (self._data is not None and self.version.get() == self._version):
+                return self._data
+        # Reading the snapshot and log as a pair must not interleave with another process's writes or compaction
+        with self.process_lock or contextlib.nullcontext(), self._lock:
+            version = self.version.get()
+            if self._pending or (self._data is not None and version == self._version):
+                return self._data
+            started = time.perf_counter()
+            data, log_records, _ = self._read()
+            record_file_io(self.snapshot_path, "read", started, self._size())
+            self._data = data
+            self._version = version
+            self._log_records = log_records
+            return self._data
+
+    def save(self, data):
+        """Replace the whole document: write a fresh snapshot and drop the log."""
+        with self._lock:
+            self._write_snapshot_locked(data)
+            self._version = self.version.bump()
+
+    def _write_snapshot_locked(self, data):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        started = time.perf_counter()
+        raw = serialization.dumps(data, self.fmt)
+        write_atomic(self.snapshot_path, raw)
+        record_file_io(self.snapshot_path, "write", started, len(raw))
+        self._pending = []
+        for path in (self.log_path, self.rotated_log_path, self.folded_log_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._data = data
+        self._log_records = 0
+
+    def append(self, op):
+        """Apply a mutation to the in-memory state and journal it."""
+        self.append_many([op])
+
+    def append_many(self, ops):
+        """Apply several mutations and journal them with a single write."""
+        with self._lock:
+            data = self.load()
+            apply_plan_records(data, ops, self.index)
+            # The log is always JSON lines, whatever the snapshot format
+            self._pending.extend(serialization.dumps_compact(op) + b"\n" for op in ops)
+            if self.writer is not None and self.writer.in_writer():
+                self.writer.mark_dirty(self)
+            else:
+                self._flush_locked()
+            self._version = self.version.bump()
+
+    def flush(self):
+        """Write buffered log lines with one append and fsync."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        raw = b"".join(self._pending)
+        with open(self.log_path, "ab") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        record_file_io(self.log_path, "append", started, len(raw))
+        self._log_records += len(self._pending)
+        self._pending = []
+        if self._log_records >= self.max_log_records:
+            self._wake.set()
+
+    def compact(self):
+        """Fold the log into a new snapshot. Safe to call while writes continue."""
+        with self.compaction_lock or contextlib.nullcontext(), self._compact_lock:
+            with self.process_lock or contextlib.nullcontext(), self._lock:
+                self._flush_locked()
+                data = self.load()
+                # load() may not have read the files; the snapshot built below must include a folded log
+                self._recover()
+                if os.path.exists(self.rotated_log_path):
+                    # Left by a compaction that died midway (none can be running while we hold compaction_lock)
+                    self._write_snapshot_locked(data)
+                    return True
+                if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+                    # _log_records only counts our own appends; another process may have compacted them
+                    self._log_records = 0
+                    return False
+                os.replace(self.log_path, self.rotated_log_path)
+                self._log_records = 0
+
+            # Only a full save() can touch these meanwhile (it removes the rotated log), checked before the swap
+            started = time.perf_counter()
+            data = self._read_snapshot()
+            apply_plan_records(data, self._read_log(self.rotated_log_path)[0])
+            snapshot = serialization.dumps(data, self.fmt)
+            tmp_path = self.compact_tmp_path
+            with open(tmp_path, "wb") as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            record_file_io(self.snapshot_path, "compact", started, len(snapshot))
+
+            with self.process_lock or contextlib.nullcontext(), self._lock:
+                if not os.path.exists(self.rotated_log_path):
+                    # A full save() replaced everything meanwhile; our snapshot is stale. Only a
+                    # compaction creates the rotated log, and we hold compaction_lock.
+                    os.remove(tmp_path)
+                    return False
+                # The data is unchanged, so whatever other processes appended meanwhile is picked up
+                # by the version check in load(), not assumed seen. Renaming the rotated log is the
+                # commit point; from here a crash is finished by _recover() rather than replayed.
+                os.replace(self.rotated_log_path, self.folded_log_path)
+                os.replace(tmp_path, self.snapshot_path)
+                os.remove(self.folded_log_path)
+            return True
+
+    def start_compactor(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._compactor_loop, name="planning-compactor", daemon=True)
+        self._thread.start()
+
+    def stop_compactor(self):
+        """Stop the background thread and fold any pending log records."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.compact()
+
+    def _compactor_loop(self):
+        while not self._stopping:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"Planning log compaction failed: {e}")
+
+
+class JournaledJsonStorage(JsonStorage):
+    """JsonStorage whose planning writes go through a PlanningJournal."""
+
+    def __init__(
+        self, data_file, planning_file, planning_default, compact_interval=30.0, max_log_records=1000,
+        commit_window=0.002, fmt="json",
+    ):
+        super().__init__(data_file, planning_file, planning_default, commit_window, fmt)
+        self.journal = PlanningJournal(
+            planning_file, planning_default, compact_interval, max_log_records,
+            index=self._plan_index, writer=self.writer, process_lock=self.process_lock, fmt=fmt,
+            version=self.planning_version_counter,
+        )
+
+    def initialize(self):
+        if not self.learning_file.exists():
+            self.save_learnings([])
+        if not os.path.exists(self.journal.snapshot_path):
+            self.save_planning(self.planning_default())
+        self.journal.start_compactor()
+
+    def shutdown(self):
+        self.writer.stop()
+        self.journal.stop_compactor()
+
+    def _version_files(self, collection):
+        if collection == "learnings":
+            return super()._version_files(collection)
+        return self.planning_version_counter, [self.journal.snapshot_path, self.journal.log_path]
+
+    def load_planning(self):
+        return self.journal.load()
+
+    @serialized
+    def save_planning(self, data):
+        self._invalidate_plan_ids()
+        self.journal.save(data)
+
+    @serialized
+    def add_plan_item(self, plan_type, item):
+        with self.journal._lock, self._index_lock:
+            self.journal.append({"op": "add", "type": plan_type, "item": item})
+
+    @serialized
+    def update_plan_item(self, plan_type, item_id, item):
+        with self.journal._lock, self._index_lock:
+            if self.get_plan_item(plan_type, item_id) is None:
+                return False
+            self.journal.append({"op": "update", "type": plan_type, "id": item_id, "item": item})
+            return True
+
+    @serialized
+    def delete_plan_item(self, plan_type, item_id):
+        if self.get_plan_item(plan_type, item_id) is None:
+            return False
+        self.journal.append({"op": "delete", "type": plan_type, "id": item_id})
+        return True
+
+    @serialized
+    def replace_plan_type(self, plan_type, items):
+        self.journal.append({"op": "replace", "type": plan_type, "items": items})
+
+    @serialized
+    def apply_plan_ops(self, ops, base_version=None):
+        with self.journal._lock:
+            if base_version is not None and base_version != self.planning_version():
+                raise VersionConflict(self.planning_version())
+            data = self.journal.load()
+            with self._index_lock:
+                records, results = resolve_plan_ops(lambda plan_type: data[plan_type], ops, self._find_plan)
+                self.journal.append_many(records)
+            return self.planning_version(), results
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learnings (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT,
+    date TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_learnings_id ON learnings(id);
+CREATE INDEX IF NOT EXISTS idx_learnings_date ON learnings(date, id);
+
+CREATE TABLE IF NOT EXISTS recap_dates (
+    learning_rowid INTEGER NOT NULL REFERENCES learnings(rowid) ON DELETE CASCADE,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recap_dates_date ON recap_dates(date);
+CREATE INDEX IF NOT EXISTS idx_recap_dates_learning ON recap_dates(learning_rowid);
+
+CREATE TABLE IF NOT EXISTS plans (
+    rowid INTEGER PRIMARY KEY,
+    plan_type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT,
+    date TEXT,
+    groupId TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_id ON plans(plan_type, id);
+CREATE INDEX IF NOT EXISTS idx_plans_date ON plans(plan_type, date, id);
+CREATE INDEX IF NOT EXISTS idx_plans_group ON plans(groupId);
+CREATE INDEX IF NOT EXISTS idx_plans_position ON plans(plan_type, position);
+
+CREATE TABLE IF NOT EXISTS task_groups (
+    rowid INTEGER PRIMARY KEY,
+    group_type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_groups_id ON task_groups(group_type, id);
+CREATE INDEX IF NOT EXISTS idx_task_groups_position ON task_groups(group_type, position);
+
+CREATE TABLE IF NOT EXISTS plan_types (
+    plan_type TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('planning_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('learnings_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('last_id', 0);
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    One row per record. Items keep their full JSON in `body`, so fields the
+    frontend adds are preserved; the columns next to it exist for indexing.
+    """
+
+    def __init__(self, db_file, planning_default):
+        super().__init__(planning_default)
+        self.db_file = db_file
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Autocommit mode; writes open their own transactions (see _transaction)
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._lock = threading.Lock()
+        self._ids_seeded = False
+
+    def initialize(self):
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO plan_types (plan_type) VALUES (?)",
+                [(plan_type,) for plan_type in self.planning_default()],
+            )
+
+    def close(self):
+        self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the database write lock up front, so a read-then-write
+        # can't interleave with another process doing the same
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # Row helpers (callers hold the lock)
+
+    def _insert_learning(self, item):
+        cur = self._conn.execute(
+            "INSERT INTO learnings (id, date, body) VALUES (?, ?, ?)",
+            (*sort_key(item)[::-1], json.dumps(item)),
+        )
+        self._insert_recap_dates(cur.lastrowid, item)
+
+    def _insert_recap_dates(self, rowid, item):
+        self._conn.executemany(
+            "INSERT INTO recap_dates (learning_rowid, date) VALUES (?, ?)",
+            [(rowid, date) for date in item.get("recap_dates") or []],
+        )
+
+    def _table_for(self, plan_type):
+        if is_task_group_type(plan_type):
+            return "task_groups", "group_type"
+        return "plans", "plan_type"
+
+    def _insert_plan(self, plan_type, position, item):
+        if not is_task_group_type(plan_type):
+            self._conn.execute(
+                "INSERT INTO plans (plan_type, position, id, date, groupId, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (plan_type, position, *sort_key(item)[::-1], item.get("groupId"), json.dumps(item)),
+            )
+        else:
+            self._conn.execute(
+                "INSERT INTO task_groups (group_type, position, id, body) VALUES (?, ?, ?, ?)",
+                (plan_type, position, item.get("id"), json.dumps(item)),
+            )
+
+    def _register_plan_type(self, plan_type):
+        self._conn.execute("INSERT OR IGNORE INTO plan_types (plan_type) VALUES (?)", (plan_type,))
+
+    def _bump_version(self, key):
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (key,))
+        return self._version(key)
+
+    def _version(self, key):
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _bump_planning_version(self):
+        return self._bump_version("planning_version")
+
+    def _planning_version(self):
+        return self._version("planning_version")
+
+    def version_token(self, collection):
+        with self._lock:
+            return str(self._version(f"{collection}_version"))
+
+    # Whole documents
+
+    def load_learnings(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT body FROM learnings ORDER BY rowid").fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def save_learnings(self, data):
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM learnings")
+            for item in data:
+                self._insert_learning(item)
+            self._bump_version("learnings_version")
+
+    def load_planning(self):
+        data = self.planning_default()
+        with self._lock:
+            for (plan_type,) in self._conn.execute("SELECT plan_type FROM plan_types"):
+                data.setdefault(plan_type, [])
+            plan_rows = self._conn.execute(
+                "SELECT plan_type, body FROM plans ORDER BY plan_type, position"
+            ).fetchall()
+            group_rows = self._conn.execute(
+                "SELECT group_type, body FROM task_groups ORDER BY group_type, position"
+            ).fetchall()
+        for plan_type, body in plan_rows + group_rows:
+            data.setdefault(plan_type, []).append(json.loads(body))
+        return data
+
+    def save_planning(self, data):
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM plans")
+            self._conn.execute("DELETE FROM task_groups")
+            self._conn.execute("DELETE FROM plan_types")
+            for plan_type, items in data.items():
+                self._register_plan_type(plan_type)
+                for position, item in enumerate(items):
+                    self._insert_plan(plan_type, position, item)
+            self._bump_planning_version()
+
+    # Learnings
+
+    def _next_id(self):
+        with self._lock, self._transaction():
+            if not self._ids_seeded:
+                ids = self._conn.execute("SELECT id FROM learnings WHERE id NOT GLOB '*[^0-9]*'").fetchall()
+                self._reserve_ids(highest_numeric_id({"id": item_id} for (item_id,) in ids))
+                self._ids_seeded = True
+            return self._bump_version("last_id")
+
+    def reserve_ids(self, value):
+        with self._lock, self._transaction():
+            self._reserve_ids(value)
+
+    def _reserve_ids(self, value):
+        self._conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'last_id'", (value,))
+
+    def get_learning(self, item_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM learnings WHERE id = ? ORDER BY rowid LIMIT 1", (item_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_learning(self, item):
+        with self._lock, self._transaction():
+            self._insert_learning(item)
+            self._bump_version("learnings_version")
+
+    def update_learning(self, item):
+        with self._lock, self._transaction():
+            row = self._find_learning(item["id"])
+            if row is None:
+                return False
+            self._update_learning(row[0], item)
+            return True
+
+    def modify_learning(self, item_id, change):
+        # Read and write in one transaction, under the lock
+        with self._lock, self._transaction():
+            row = self._find_learning(item_id)
+            if row is None:
+                return None
+            item = change(json.loads(row[1]))
+            self._update_learning(row[0], item)
+            return item
+
+    def modify_learnings(self, change):
+        with self._lock, self._transaction():
+            rows = self._conn.execute("SELECT body FROM learnings ORDER BY rowid").fetchall()
+            replaced = change([json.loads(body) for (body,) in rows])
+            for item in replaced:
+                row = self._find_learning(item["id"])
+                if row is not None:
+                    self._update_learning(row[0], item)
+            return len(replaced)
+
+    def _find_learning(self, item_id):
+        return self._conn.execute(
+            "SELECT rowid, body FROM learnings WHERE id = ? ORDER BY rowid LIMIT 1", (item_id,)
+        ).fetchone()
+
+    def _update_learning(self, rowid, item):
+        self._conn.execute(
+            "UPDATE learnings SET date = ?, body = ? WHERE rowid = ?",
+            (sort_key(item)[0], json.dumps(item), rowid),
+        )
+        self._conn.execute("DELETE FROM recap_dates WHERE learning_rowid = ?", (rowid,))
+        self._insert_recap_dates(rowid, item)
+        self._bump_version("learnings_version")
+
+    def delete_learning(self, item_id):
+        with self._lock, self._transaction():
+            cur = self._conn.execute("DELETE FROM learnings WHERE id = ?", (item_id,))
+            if cur.rowcount == 0:
+                return False
+            self._bump_version("learnings_version")
+            return True
+
+    def _page(self, table, where, params, start, end, after, limit):
+        # date and id are stored as sort_key() values, so this ORDER BY matches SortedIndex
+        clauses = list(where)
+        params = list(params)
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        if after is not None:
+            clauses.append("(date, id) > (?, ?)")
+            params.extend(after)
+        sql = f"SELECT body, date, id FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date, id"
+        if limit is not None:
+            # One extra row tells us whether there is a next page
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            return [json.loads(row[0]) for row in rows], (rows[-1][1], rows[-1][2])
+        return [json.loads(row[0]) for row in rows], None
+
+    def page_learnings(self, start=None, end=None, after=None, limit=None):
+        return self._page("learnings", [], [], start, end, after, limit)
+
+    def page_plan_type(self, plan_type, start=None, end=None, after=None, limit=None):
+        if is_task_group_type(plan_type):
+            # Task groups have no date column; there are few enough to sort in memory
+            return super().page_plan_type(plan_type, start, end, after, limit)
+        return self._page("plans", ["plan_type = ?"], [plan_type], start, end, after, limit)
+
+    def reminders_between(self, start, end):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.date, l.body FROM recap_dates r JOIN learnings l ON l.rowid = r.learning_rowid "
+                "WHERE r.date BETWEEN ? AND ? ORDER BY r.date, l.rowid",
+                (start, end),
+            ).fetchall()
+        reminders = {}
+        for date, body in rows:
+            reminders.setdefault(date, []).append(json.loads(body))
+        return reminders
+
+    def review_schedule(self, start, end, include_items=True):
+        # recap_dates is the calendar here; only rows in the range are read
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT r.date, l.rowid, l.id, json_extract(l.body, '$.content'), "
+                "EXISTS (SELECT 1 FROM json_each(l.body, '$.completed_dates') c WHERE c.value = r.date) "
+                "FROM recap_dates r JOIN learnings l ON l.rowid = r.learning_rowid "
+                "WHERE r.date BETWEEN ? AND ? ORDER BY r.date, l.rowid",
+                (start, end),
+            ).fetchall()
+        days = []
+        for date, _, item_id, content, completed in rows:
+            if not days or days[-1]["date"] != date:
+                days.append({"date": date, "due": 0, "completed": 0})
+                if include_items:
+                    days[-1]["items"] = []
+            day = days[-1]
+            day["due"] += 1
+            day["completed"] += bool(completed)
+            if include_items:
+                day["items"].append({"id": item_id, "content": content, "completed": bool(completed)})
+        return days
+
+    # Planning
+
+    def plan_types(self):
+        with self._lock:
+            stored = [row[0] for row in self._conn.execute("SELECT plan_type FROM plan_types")]
+        return list(dict.fromkeys(list(self.planning_default()) + stored))
+
+    def load_plan_type(self, plan_type):
+        table, type_column = self._table_for(plan_type)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT body FROM {table} WHERE {type_column} = ? ORDER BY position", (plan_type,)
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def get_plan_item(self, plan_type, item_id):
+        table, type_column = self._table_for(plan_type)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT body FROM {table} WHERE {type_column} = ? AND id = ? ORDER BY position LIMIT 1",
+                (plan_type, item_id),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_plan_item(self, plan_type, item):
+        table, type_column = self._table_for(plan_type)
+        with self._lock, self._transaction():
+            self._register_plan_type(plan_type)
+            self._append_plan(plan_type, item)
+            self._bump_planning_version()
+
+    def _append_plan(self, plan_type, item):
+        table, type_column = self._table_for(plan_type)
+        position = self._conn.execute(
+            f"SELECT COALESCE(MAX(position) + 1, 0) FROM {table} WHERE {type_column} = ?", (plan_type,)
+        ).fetchone()[0]
+        self._insert_plan(plan_type, position, item)
+
+    def update_plan_item(self, plan_type, item_id, item):
+        with self._lock, self._transaction():
+            if not self._update_plan(plan_type, item_id, item):
+                return False
+            self._bump_planning_version()
+            return True
+
+    def modify_plan_item(self, plan_type, item_id, change):
+        with self._lock, self._transaction():
+            row = self._find_plan(plan_type, item_id)
+            if row is None:
+                return None
+            item = change(json.loads(row[1]))
+            self._update_plan(plan_type, item_id, item)
+            self._bump_planning_version()
+            return item
+
+    def _find_plan(self, plan_type, item_id):
+        table, type_column = self._table_for(plan_type)
+        return self._conn.execute(
+            f"SELECT rowid, body FROM {table} WHERE {type_column} = ? AND id = ? ORDER BY position LIMIT 1",
+            (plan_type, item_id),
+        ).fetchone()
+
+    def _update_plan(self, plan_type, item_id, item):
+        row = self._find_plan(plan_type, item_id)
+        if row is None:
+            return False
+        if not is_task_group_type(plan_type):
+            self._conn.execute(
+                "UPDATE plans SET id = ?, date = ?, groupId = ?, body = ? WHERE rowid = ?",
+                (*sort_key(item)[::-1], item.get("groupId"), json.dumps(item), row[0]),
+            )
+        else:
+            self._conn.execute(
+                "UPDATE task_groups SET id = ?, body = ? WHERE rowid = ?",
+                (item.get("id"), json.dumps(item), row[0]),
+            )
+        return True
+
+    def delete_plan_item(self, plan_type, item_id):
+        with self._lock, self._transaction():
+            if not self._delete_plan(plan_type, item_id):
+                return False
+            self._bump_planning_version()
+            return True
+
+    def _delete_plan(self, plan_type, item_id):
+        table, type_column = self._table_for(plan_type)
+        cur = self._conn.execute(
+            f"DELETE FROM {table} WHERE {type_column} = ? AND id = ?", (plan_type, item_id)
+        )
+        return cur.rowcount > 0
+
+    def replace_plan_type(self, plan_type, items):
+        table, type_column = self._table_for(plan_type)
+        with self._lock, self._transaction():
+            self._register_plan_type(plan_type)
+            self._conn.execute(f"DELETE FROM {table} WHERE {type_column} = ?", (plan_type,))
+            for position, item in enumerate(items):
+                self._insert_plan(plan_type, position, item)
+            self._bump_planning_version()
+
+    def planning_version(self):
+        with self._lock:
+            return self._planning_version()
+
+    def apply_plan_ops(self, ops, base_version=None):
+        # One transaction, touching only the rows the operations name
+        with self._lock, self._transaction():
+            if base_version is not None and base_version != self._planning_version():
+                raise VersionConflict(self._planning_version())
+            results = []
+            for op in ops:
+                plan_type = op["type"]
+                self._register_plan_type(plan_type)
+                kind = op["op"]
+                if kind == "add":
+                    self._append_plan(plan_type, op["item"])
+                    results.append(op["item"])
+                elif kind == "update":
+                    row = self._find_plan(plan_type, op["id"])
+                    if row is None:
+                        raise ItemNotFound(f"Item '{op['id']}' not found in {plan_type}")
+                    item = {**json.loads(row[1]), **(op.get("updates") or {})}
+                    self._update_plan(plan_type, op["id"], item)
+                    results.append(item)
+                elif kind == "delete":
+                    if not self._delete_plan(plan_type, op["id"]):
+                        raise ItemNotFound(f"Item '{op['id']}' not found in {plan_type}")
+                    results.append(None)
+                else:
+                    raise ValueError(f"Unknown operation '{kind}'")
+            return self._bump_planning_version(), results
+
+
+class InstrumentedStorage:
+    """
+    Wraps a store so every public method call is timed into
+    storage_operation_duration_seconds, labelled with the backend name.
+    """
+
+    def __init__(self, store, backend):
+        self._store = store
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def timed(*args, **kwargs):
+            with OPERATION_SECONDS.time(self._backend, name):
+                return attr(*args, **kwargs)
+
+        # Cached so later lookups skip __getattr__
+        setattr(self, name, timed)
+        return timed
+
+
+def open_storage(
+    backend, data_file, planning_file, db_file, planning_default, planning_journal=False, commit_window=0.002,
+    fmt="json",
+):
+    """
+    Create the storage backend named by STORAGE_BACKEND ("json" or "sqlite").
+    planning_journal, commit_window (seconds) and fmt (STORAGE_FORMAT) only
+    apply to the JSON backend.
+    """
+    if backend == "json":
+        if planning_journal:
+            return JournaledJsonStorage(
+                data_file, planning_file, planning_default, commit_window=commit_window, fmt=fmt
+            )
+        return JsonStorage(data_file, planning_file, planning_default, commit_window, fmt)
+    if backend == "sqlite":
+        is_new = not os.path.exists(db_file)
+        store = SqliteStorage(db_file, planning_default)
+        if is_new:
+            # First start on SQLite: bring over whatever the JSON files hold
+            migrate_json_to_sqlite(JsonStorage(data_file, planning_file, planning_default), store)
+        return store
+    raise ValueError(f"Unknown storage backend '{backend}' (expected 'json' or 'sqlite')")
+
+
+def migrate_json_to_sqlite(source, target):
+    """
+    Copy every learning and plan from a JsonStorage into a SqliteStorage.
+    Planning is read through its journal even if source isn't a
+    JournaledJsonStorage, so records still in a log left by PLANNING_JOURNAL=1
+    aren't lost.
+    """
+    learnings = source.load_learnings()
+    planning = PlanningJournal(
+        source.planning_file.path, source.planning_default, process_lock=source.process_lock,
+    ).load()
+    target.save_learnings(learnings)
+    target.save_planning(planning)
+    target.reserve_ids(source.id_counter.get())
+    return len(learnings), sum(len(items) for items in planning.values())
+
+
+def convert_data_files(data_file, planning_file, fmt):
+    """
+    Rewrite the JSON backend's files in `fmt`, folding any planning journal
+    into the snapshot. Returns {path: (old size, new size)}. Both files are
+    read before either is written, so one that can't be decoded (DecodeError)
+    leaves everything as it was.
+    """
+    serialization.check_format(fmt)
+    sizes = {}
+
+    def size(path):
+        return sum(os.path.getsize(p) for p in (path, path + ".log", path + ".log.1") if os.path.exists(p))
+
+    with FileLock(os.path.join(os.path.dirname(data_file), "storage.lock")):
+        learnings = CachedJsonFile(data_file, list, fmt=fmt)
+        journal = PlanningJournal(planning_file, _empty_planning, fmt=fmt)
+        learning_data = learnings.load() if learnings.exists() else None
+        planning_data = None
+        if any(os.path.exists(p) for p in (planning_file, journal.log_path, journal.rotated_log_path)):
+            planning_data = journal.load()
+        if learning_data is not None:
+            before = size(data_file)
+            learnings.save(learning_data)
+            sizes[data_file] = (before, size(data_file))
+        if planning_data is not None:
+            before = size(planning_file)
+            journal.save(planning_data)
+            sizes[planning_file] = (before, size(planning_file))
+    return sizes
+
+
+def _empty_planning():
+    # Mirrors main.PlanningData() without importing the app
+    return {
+        "dailyPlans": [],
+        "weeklyPlans": [],
+        "monthlyPlans": [],
+        "yearlyPlans": [],
+        "taskGroups": [],
+        "monthlyTaskGroups": [],
+        "yearlyTaskGroups": [],
+    }
+
+
+if __name__ == "__main__":
+    default_data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    parser = argparse.ArgumentParser(description="Recap Plan storage tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Copy the JSON data files into a SQLite database")
+    migrate.add_argument("--data-dir", default=default_data_dir)
+    migrate.add_argument("--db", default=None, help="Defaults to <data-dir>/recap_plan.db")
+    convert = subparsers.add_parser("convert", help="Rewrite the JSON backend's data files in another format")
+    convert.add_argument("--format", required=True, choices=serialization.FORMATS)
+    convert.add_argument("--data-dir", default=default_data_dir)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        db_file = args.db or os.path.join(args.data_dir, "recap_plan.db")
+        source = JsonStorage(
+            os.path.join(args.data_dir, "learning_data.json"),
+            os.path.join(args.data_dir, "planning_data.json"),
+            _empty_planning,
+        )
+        target = SqliteStorage(db_file, _empty_planning)
+        learning_count, plan_count = migrate_json_to_sqlite(source, target)
+        target.close()
+        print(f"Migrated {learning_count} learnings and {plan_count} planning records into {db_file}")
+
+    if args.command == "convert":
+        try:
+            serialization.check_format(args.format)
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            sizes = convert_data_files(
+                os.path.join(args.data_dir, "learning_data.json"),
+                os.path.join(args.data_dir, "planning_data.json"),
+                args.format,
+            )
+        except serialization.DecodeError as e:
+            parser.exit(1, f"{e}\nNothing was converted.\n")
+        for path, (before, after) in sizes.items():
+            print(f"{path}: {before} -> {after} bytes ({args.format})")
+        print(f"Set STORAGE_FORMAT={args.format} so new writes use the same format")
@@ -0,0 +1,86 @@
+def plan(plan_id, **fields):
+    return {"id": plan_id, "section": "morning", "content": plan_id, "date": "2026-01-01", **fields}
+
+
+def test_batch_with_a_stale_base_version_is_rejected(client):
+    version = client.get("/api/planning/weeklyPlans").json()["version"]
+    client.post("/api/planning/weeklyPlans", json=plan("batch-stale"))
+
+    stale = client.post("/api/planning/batch", json={
+        "operations": [{"op": "delete", "type": "weeklyPlans", "id": "batch-stale"}],
+        "base_version": version,
+    })
+    assert stale.status_code == 409
+    current = stale.json()["detail"]["version"]
+    assert current > version
+
+    applied = client.post("/api/planning/batch", json={
+        "operations": [{"op": "delete", "type": "weeklyPlans", "id": "batch-stale"}],
+        "base_version": current,
+    })
+    assert applied.status_code == 200
+    assert applied.json()["version"] > current
+    assert "batch-stale" not in [item["id"] for item in client.get("/api/planning/weeklyPlans").json()["weeklyPlans"]]
+
+
+def test_conditional_get_returns_304_until_the_data_changes(client):
+    first = client.get("/api/planning/monthlyPlans")
+    etag = first.headers["etag"]
+    assert client.get("/api/planning/monthlyPlans", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/planning", headers={"If-None-Match": etag}).status_code == 200
+
+    client.post("/api/planning/monthlyPlans", json=plan("etag-change"))
+    changed = client.get("/api/planning/monthlyPlans", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_unknown_plan_type_is_404_even_with_if_none_match(client):
+    for header in ("*", client.get("/api/planning/dailyPlans").headers["etag"]):
+        response = client.get("/api/planning/noSuchPlans", headers={"If-None-Match": header})
+        assert response.status_code == 404
+
+
+def test_bad_cursor_is_400_even_with_if_none_match(client):
+    for path in ("/api/learnings", "/api/planning/dailyPlans"):
+        response = client.get(path, params={"cursor": "not-a-cursor"}, headers={"If-None-Match": "*"})
+        assert response.status_code == 400
+
+
+def walk(client, path, key, **params):
+    """Every page of a paged list, following the cursor"""
+    items, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        if key is None:
+            items += response.json()
+            cursor = response.headers.get("x-next-cursor")
+        else:
+            items += response.json()[key]
+            cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_planning_pages_follow_date_then_id_order(client):
+    for plan_id, date in [("p3", "2031-01-02"), ("p1", "2031-01-01"), ("p4", "2031-01-03"), ("p2", "2031-01-02"), ("p0", "2030-12-31")]:
+        client.post("/api/planning/yearlyPlans", json=plan(plan_id, date=date))
+
+    items = walk(client, "/api/planning/yearlyPlans", "yearlyPlans", limit=2, fields="id,date", **{"from": "2031-01-01", "to": "2031-01-02"})
+    assert items == [
+        {"id": "p1", "date": "2031-01-01"},
+        {"id": "p2", "date": "2031-01-02"},
+        {"id": "p3", "date": "2031-01-02"},
+    ]
+
+
+def test_learning_pages_keep_the_unpaged_shape(client):
+    for content, date in [("later", "2032-05-02"), ("earlier", "2032-05-01"), ("outside", "2032-06-01")]:
+        client.post("/api/learnings", json={"date": date, "content": content})
+
+    paged = walk(client, "/api/learnings", None, limit=1, **{"from": "2032-05-01", "to": "2032-05-31"})
+    assert [item["content"] for item in paged] == ["earlier", "later"]
+    unpaged = {item["id"]: item for item in client.get("/api/learnings").json()}
+    assert paged == [unpaged[item["id"]] for item in paged]
+    assert walk(client, "/api/learnings", None, fields="content", **{"from": "2032-06-01"}) == [{"content": "outside"}]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import extraction_cache
+
+
+def key(conversation="hi"):
+    return extraction_cache.make_key("/api/extract-plan", "gpt-4o", [{"role": "user", "content": conversation}], None, None)
+
+
+def test_key_covers_the_whole_prompt():
+    assert key() == key()
+    assert key() != key("hello")
+
+
+def test_lru_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(extraction_cache.time, "time", lambda: now[0])
+    cache = extraction_cache.ExtractionCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"plans": []})
+    cache.set("b", {"plans": []})
+    assert cache.get("a") == {"plans": []}
+    cache.set("c", {"plans": []})
+
+    # b was the least recently used
+    assert cache.get("b") is None
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    extraction_cache.ExtractionCache(disk_dir=str(tmp_path)).set(key(), {"plans": [1]})
+
+    restarted = extraction_cache.ExtractionCache(disk_dir=str(tmp_path))
+    assert restarted.get(key()) == {"plans": [1]}
+    assert restarted.get(key()) == {"plans": [1]}
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get(key("other")) is None
+
+
+def test_async_disk_io_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = extraction_cache.ExtractionCache(disk_dir=str(tmp_path))
+    threads = []
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+    monkeypatch.setattr(cache, "_read_disk", lambda *args: (threads.append(threading.get_ident()), read_disk(*args))[1])
+    monkeypatch.setattr(cache, "_write_disk", lambda *args: (threads.append(threading.get_ident()), write_disk(*args))[1])
+
+    async def run():
+        await cache.set_async(key(), {"plans": [1]})
+        cache._entries.clear()
+        return await cache.get_async(key()), threading.get_ident()
+
+    value, loop_thread = asyncio.run(run())
+    assert value == {"plans": [1]}
+    assert len(threads) == 2 and loop_thread not in threads
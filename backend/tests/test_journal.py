@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import storage
+
+
+class Crash(Exception):
+    pass
+
+
+def plan(plan_id, **fields):
+    return {"id": plan_id, "section": "morning", "content": plan_id, "date": "2026-01-01", **fields}
+
+
+def ids(journal):
+    return [item["id"] for item in journal.load()["dailyPlans"]]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "planning_data.json")
+
+
+def test_torn_tail_is_cut_so_later_appends_survive(path):
+    journal = storage.PlanningJournal(path, storage._empty_planning)
+    journal.save(storage._empty_planning())
+    journal.append({"op": "add", "type": "dailyPlans", "item": plan("a")})
+    with open(journal.log_path, "ab") as f:
+        f.write(b'{"op":"add","type":"dailyPl')
+
+    reopened = storage.PlanningJournal(path, storage._empty_planning)
+    assert ids(reopened) == ["a"]
+    reopened.append({"op": "add", "type": "dailyPlans", "item": plan("b")})
+
+    assert ids(storage.PlanningJournal(path, storage._empty_planning)) == ["a", "b"]
+
+
+@pytest.mark.parametrize("crash_before", ["snapshot swap", "marker removal"])
+def test_crash_during_compaction_swap_replays_nothing_twice(path, monkeypatch, crash_before):
+    journal = storage.PlanningJournal(path, storage._empty_planning)
+    journal.save(storage._empty_planning())
+    journal.append({"op": "add", "type": "dailyPlans", "item": plan("x")})
+    # Replayed twice, the add would put x back next to y
+    journal.append({"op": "update", "type": "dailyPlans", "id": "x", "item": plan("y")})
+
+    real_replace, real_remove = os.replace, os.remove
+
+    def replace(src, dst):
+        if crash_before == "snapshot swap" and src == journal.compact_tmp_path:
+            raise Crash()
+        real_replace(src, dst)
+
+    def remove(target):
+        if crash_before == "marker removal" and target == journal.folded_log_path:
+            raise Crash()
+        real_remove(target)
+
+    monkeypatch.setattr(os, "replace", replace)
+    monkeypatch.setattr(os, "remove", remove)
+    with pytest.raises(Crash):
+        journal.compact()
+    monkeypatch.undo()
+
+    reopened = storage.PlanningJournal(path, storage._empty_planning)
+    assert ids(reopened) == ["y"]
+    assert not os.path.exists(reopened.folded_log_path)
+    assert storage.serialization.load_file(path, storage._empty_planning)["dailyPlans"] == [plan("y")]
+
+
+def test_appends_made_during_another_compaction_are_seen(path, monkeypatch):
+    lock_path = os.path.join(os.path.dirname(path), "storage.lock")
+    compacting = storage.PlanningJournal(path, storage._empty_planning, process_lock=storage.FileLock(lock_path))
+    other = storage.PlanningJournal(path, storage._empty_planning, process_lock=storage.FileLock(lock_path))
+    compacting.save(storage._empty_planning())
+    compacting.append({"op": "add", "type": "dailyPlans", "item": plan("a", count=0)})
+    other.load()
+
+    dumps = storage.serialization.dumps
+
+    def dumps_while_other_appends(data, fmt="json"):
+        # Runs while the new snapshot is built, outside the process lock
+        other.append({"op": "update", "type": "dailyPlans", "id": "a", "item": plan("a", count=1)})
+        return dumps(data, fmt)
+
+    monkeypatch.setattr(storage.serialization, "dumps", dumps_while_other_appends)
+    assert compacting.compact()
+    monkeypatch.undo()
+
+    assert compacting.load()["dailyPlans"] == [plan("a", count=1)]
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import jsonstream
+
+DOCUMENT = {
+    "notes": [{"plans": ["not", "these"]}],
+    "plans": [
+        {"day": 1, "tasks": [{"content": "braces } ] in a string"}]},
+        {"day": 2, "tasks": [], "quote": "say \"hi\" \\"},
+    ],
+    "summary": {"plans": [{"day": 99}]},
+}
+
+
+def feed_in_pieces(text, size):
+    parser = jsonstream.ArrayItemParser("plans")
+    items = []
+    for start in range(0, len(text), size):
+        items.append(parser.feed(text[start:start + size]))
+    return parser, items
+
+
+def test_items_come_out_whole_at_any_chunk_size():
+    text = json.dumps(DOCUMENT)
+    for size in (1, 2, 3, 7, len(text)):
+        parser, items = feed_in_pieces(text, size)
+        assert [item for batch in items for item in batch] == DOCUMENT["plans"]
+        assert parser.document() == DOCUMENT
+
+
+def test_each_item_is_returned_by_the_chunk_that_closes_it():
+    text = json.dumps({"plans": [{"day": 1}, {"day": 2}]})
+    cut = text.index("}") + 1
+    parser = jsonstream.ArrayItemParser("plans")
+    assert parser.feed(text[:cut - 1]) == []
+    assert parser.feed(text[cut - 1:cut]) == [{"day": 1}]
+    assert parser.feed(text[cut:]) == [{"day": 2}]
+
+
+def test_incomplete_document_fails_to_parse():
+    parser = jsonstream.ArrayItemParser("plans")
+    parser.feed('{"plans": [{"day": 1}')
+    with pytest.raises(ValueError):
+        parser.document()
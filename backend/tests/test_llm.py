@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm
+
+ENDPOINT = "test"
+
+
+def status_error(status):
+    response = httpx.Response(status, request=httpx.Request("POST", "http://api.test/v1/chat/completions"))
+    return openai.APIStatusError(f"HTTP {status}", response=response, body=None)
+
+
+def fake_client(*outcomes):
+    """A client whose successive calls raise the given errors, or sleep for the given seconds and answer."""
+    calls = []
+
+    async def create(**kwargs):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        await asyncio.sleep(outcome)
+        return SimpleNamespace(usage=None, answered=len(calls))
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), calls
+
+
+def complete(client):
+    return asyncio.run(llm.create_chat_completion(client, ENDPOINT, model="gpt-4o-mini", messages=[]))
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker(threshold=3, cooldown=30))
+    monkeypatch.setattr(llm, "latencies", llm.LatencyWindow())
+    monkeypatch.setattr(llm, "OPENAI_BACKOFF", 0)
+    monkeypatch.setattr(llm, "OPENAI_RETRIES", 2)
+    monkeypatch.setattr(llm, "OPENAI_HEDGE", False)
+    monkeypatch.setitem(llm.DEADLINES, ENDPOINT, 5.0)
+
+
+def test_retryable_errors_are_retried():
+    client, calls = fake_client(status_error(503), status_error(429), 0)
+    assert complete(client).answered == 3
+    assert llm.breaker.failures == 0
+
+
+def test_client_errors_are_not_retried():
+    client, calls = fake_client(status_error(400), 0)
+    with pytest.raises(openai.APIStatusError):
+        complete(client)
+    assert len(calls) == 1
+
+
+def test_client_errors_do_not_count_as_successes_for_the_breaker(monkeypatch):
+    monkeypatch.setattr(llm, "OPENAI_RETRIES", 0)
+    for status in (500, 400, 500, 500):
+        with pytest.raises(openai.APIStatusError):
+            complete(fake_client(status_error(status))[0])
+
+    # The 400 in between did not reset the run of failures
+    client, calls = fake_client(0)
+    with pytest.raises(llm.CircuitOpenError):
+        complete(client)
+    assert calls == []
+
+
+def test_breaker_lets_one_trial_through_after_the_cooldown(monkeypatch):
+    for _ in range(3):
+        llm.breaker.record(False)
+    with pytest.raises(llm.CircuitOpenError):
+        llm.breaker.allow()
+
+    monkeypatch.setattr(llm.breaker, "opened_at", llm.time.monotonic() - 31)
+    llm.breaker.allow()
+    with pytest.raises(llm.CircuitOpenError):
+        llm.breaker.allow()
+    llm.breaker.record(True)
+    llm.breaker.allow()
+
+
+def test_slow_attempt_is_hedged(monkeypatch):
+    monkeypatch.setattr(llm, "OPENAI_HEDGE", True)
+    for _ in range(llm.OPENAI_HEDGE_MIN_SAMPLES):
+        llm.latencies.add(ENDPOINT, 0.01)
+
+    client, calls = fake_client(2, 0)
+    started = llm.time.monotonic()
+    assert complete(client).answered == 2
+    assert llm.time.monotonic() - started < 1
+
+
+def test_deadline_covers_the_whole_call(monkeypatch):
+    monkeypatch.setitem(llm.DEADLINES, ENDPOINT, 0.05)
+    with pytest.raises(llm.DeadlineExceededError):
+        complete(fake_client(1)[0])
@@ -0,0 +1,47 @@
+import storage
+
+
+def plan(plan_id):
+    return {"id": plan_id, "section": "morning", "content": plan_id, "date": "2026-01-01", "completed": False}
+
+
+def write_journaled_planning(planning_file):
+    """A snapshot with one plan and a journal log holding two more that were never compacted."""
+    journal = storage.PlanningJournal(planning_file, storage._empty_planning)
+    snapshot = storage._empty_planning()
+    snapshot["dailyPlans"].append(plan("p1"))
+    journal.save(snapshot)
+    journal.append({"op": "add", "type": "dailyPlans", "item": plan("p2")})
+    journal.append({"op": "update", "type": "dailyPlans", "item": {**plan("p1"), "completed": True}})
+    journal.append({"op": "add", "type": "weeklyPlans", "item": plan("w1")})
+
+
+def test_migration_includes_uncompacted_journal_records(tmp_path):
+    data_file = str(tmp_path / "learning_data.json")
+    planning_file = str(tmp_path / "planning_data.json")
+    write_journaled_planning(planning_file)
+
+    source = storage.JsonStorage(data_file, planning_file, storage._empty_planning)
+    target = storage.SqliteStorage(str(tmp_path / "recap_plan.db"), storage._empty_planning)
+    _, plan_count = storage.migrate_json_to_sqlite(source, target)
+
+    planning = target.load_planning()
+    assert plan_count == 3
+    assert [(item["id"], item["completed"]) for item in planning["dailyPlans"]] == [("p1", True), ("p2", False)]
+    assert [item["id"] for item in planning["weeklyPlans"]] == ["w1"]
+    target.close()
+    source.shutdown()
+
+
+def test_first_sqlite_start_migrates_journal_log(tmp_path):
+    data_file = str(tmp_path / "learning_data.json")
+    planning_file = str(tmp_path / "planning_data.json")
+    write_journaled_planning(planning_file)
+
+    store = storage.open_storage(
+        "sqlite", data_file, planning_file, str(tmp_path / "recap_plan.db"), storage._empty_planning,
+    )
+    planning = store.load_planning()
+    assert sorted(item["id"] for item in planning["dailyPlans"]) == ["p1", "p2"]
+    assert [item["id"] for item in planning["weeklyPlans"]] == ["w1"]
+    store.close()
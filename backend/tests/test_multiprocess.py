@@ -0,0 +1,74 @@
+import multiprocessing
+
+import pytest
+
+import storage
+
+ITERATIONS = 40
+PROCESSES = ("a", "b", "c")
+
+
+def open_store(backend, data_dir):
+    if backend == "journal":
+        # Compact every few records so compactions overlap other processes' writes
+        store = storage.JournaledJsonStorage(
+            f"{data_dir}/learning_data.json", f"{data_dir}/planning_data.json", storage._empty_planning,
+            compact_interval=0.05, max_log_records=7,
+        )
+    else:
+        store = storage.open_storage(
+            backend,
+            f"{data_dir}/learning_data.json",
+            f"{data_dir}/planning_data.json",
+            f"{data_dir}/recap_plan.db",
+            storage._empty_planning,
+        )
+    store.initialize()
+    return store
+
+
+def bump(item):
+    return {**item, "count": item["count"] + 1}
+
+
+def worker(backend, data_dir, name, start):
+    """Read-modify-write the shared learning and plan, and add items of our own."""
+    store = open_store(backend, data_dir)
+    start.wait()
+    for i in range(ITERATIONS):
+        store.modify_learning("1", bump)
+        store.modify_plan_item("dailyPlans", "shared", bump)
+        store.add_learning({"id": store.allocate_id(), "content": f"{name}-{i}"})
+        store.apply_plan_ops([{"op": "add", "type": "dailyPlans", "item": {"id": f"{name}-{i}", "count": 0}}])
+    store.shutdown()
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_processes_sharing_a_data_dir_lose_no_updates(tmp_path, backend):
+    data_dir = str(tmp_path)
+    store = open_store(backend, data_dir)
+    store.add_learning({"id": store.allocate_id(), "content": "shared", "count": 0})
+    store.add_plan_item("dailyPlans", {"id": "shared", "count": 0})
+    version = store.planning_version()
+    store.shutdown()
+
+    # spawn, not fork: each process must open the storage on its own
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(len(PROCESSES))
+    processes = [context.Process(target=worker, args=(backend, data_dir, name, start)) for name in PROCESSES]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+    assert [process.exitcode for process in processes] == [0] * len(PROCESSES)
+
+    store = open_store(backend, data_dir)
+    learnings = store.load_learnings()
+    plans = store.load_plan_type("dailyPlans")
+    assert store.get_learning("1")["count"] == len(PROCESSES) * ITERATIONS
+    assert store.get_plan_item("dailyPlans", "shared")["count"] == len(PROCESSES) * ITERATIONS
+    assert len(learnings) == len({item["id"] for item in learnings}) == len(PROCESSES) * ITERATIONS + 1
+    assert len(plans) == len(PROCESSES) * ITERATIONS + 1
+    # Two planning writes per iteration, each bumping the shared version once
+    assert store.planning_version() == version + 2 * len(PROCESSES) * ITERATIONS
+    store.shutdown()
@@ -0,0 +1,54 @@
+import pytest
+
+import scheduler
+
+pytestmark = pytest.mark.skipif(not scheduler.numpy_available(), reason="reschedule() needs numpy")
+
+
+def learning(item_id, recap_dates, completed_dates=(), **fields):
+    return {"id": item_id, "date": "2026-01-01", "content": item_id,
+            "recap_dates": list(recap_dates), "completed_dates": list(completed_dates), **fields}
+
+
+def test_reviews_done_on_time_grow_the_interval():
+    item = learning("known", ["2026-01-04", "2026-01-10"], ["2026-01-10"],
+                    ease=2.5, interval=4, graded_through="2026-01-04")
+
+    [result] = scheduler.reschedule([item], today="2026-01-12")
+
+    assert result["interval"] == 10 and result["ease"] == 2.5
+    assert result["recap_dates"] == ["2026-01-04", "2026-01-10", "2026-01-20"]
+    assert result["graded_through"] == "2026-01-10"
+
+
+def test_first_review_on_time_plans_the_next_from_it():
+    # Without an interval yet, the gap since the learning's date (1 day) is the base
+    item = learning("1", ["2026-01-02", "2026-01-04", "2026-01-08"], ["2026-01-02"])
+
+    [result] = scheduler.reschedule([item], today="2026-01-03")
+
+    assert result["ease"] == 2.5 and result["interval"] == 2
+    assert result["recap_dates"] == ["2026-01-02", "2026-01-04"]
+    assert result["graded_through"] == "2026-01-02"
+    assert item["recap_dates"] == ["2026-01-02", "2026-01-04", "2026-01-08"]
+
+
+def test_missed_review_resets_the_interval_and_lowers_the_ease():
+    item = learning("1", ["2026-01-02", "2026-01-04"])
+
+    [result] = scheduler.reschedule([item], today="2026-01-03")
+
+    assert result["ease"] == 1.96 and result["interval"] == 1
+    assert result["recap_dates"] == ["2026-01-02", "2026-01-03"]
+
+
+def test_rescheduling_twice_on_the_same_day_changes_nothing():
+    items = [learning("done", ["2026-01-02"], ["2026-01-02"]), learning("missed", ["2026-01-02"])]
+    first = scheduler.reschedule(items, today="2026-01-03")
+    assert len(first) == 2
+    assert scheduler.reschedule(first, today="2026-01-03") == []
+
+
+def test_nothing_due_yet_is_left_alone():
+    assert scheduler.reschedule([learning("1", ["2026-01-05"])], today="2026-01-03") == []
+    assert scheduler.reschedule([], today="2026-01-03") == []
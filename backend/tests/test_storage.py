@@ -0,0 +1,146 @@
+import os
+
+import pytest
+
+import storage
+
+
+def test_cached_file_reloads_when_the_version_moves_but_the_stat_does_not(tmp_path):
+    path = str(tmp_path / "learning_data.json")
+    counter_path = path + ".version"
+    writer = storage.CachedJsonFile(path, list, version=storage.VersionCounter(counter_path))
+    reader = storage.CachedJsonFile(path, list, version=storage.VersionCounter(counter_path))
+    writer.save([{"id": "1", "content": "a"}])
+    writer.version.bump()
+    assert reader.load()[0]["content"] == "a"
+
+    # Same inode, size and mtime: what a save by another process within one mtime tick can look like
+    st = os.stat(path)
+    with open(path, "r+b") as f:
+        raw = f.read().replace(b'"a"', b'"b"')
+        f.seek(0)
+        f.write(raw)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    storage.VersionCounter(counter_path).bump()
+
+    assert reader.load()[0]["content"] == "b"
+
+
+def test_version_counter_sees_other_writers(tmp_path):
+    path = str(tmp_path / "planning_data.json.version")
+    first, second = storage.VersionCounter(path), storage.VersionCounter(path)
+    first.bump()
+    second.bump()
+    assert first.get() == second.get() == 2
+
+
+def plan(plan_id, **fields):
+    return {"id": plan_id, "section": "morning", "content": plan_id, "date": "2026-01-01", **fields}
+
+
+def open_json_store(kind, data_dir):
+    files = (f"{data_dir}/learning_data.json", f"{data_dir}/planning_data.json", storage._empty_planning)
+    store = storage.JournaledJsonStorage(*files) if kind == "journal" else storage.JsonStorage(*files)
+    store.initialize()
+    return store
+
+
+@pytest.fixture(params=["json", "journal"])
+def json_store(request, tmp_path):
+    store = open_json_store(request.param, tmp_path)
+    yield store
+    store.shutdown()
+
+
+def daily_ids(store):
+    return [item["id"] for item in store.load_plan_type("dailyPlans")]
+
+
+def test_batch_keeps_the_id_index_current(json_store, monkeypatch):
+    json_store.apply_plan_ops([{"op": "add", "type": "dailyPlans", "item": plan(str(n))} for n in range(100)])
+    assert json_store.get_plan_item("dailyPlans", "5")["id"] == "5"
+
+    rebuilds = []
+    rebuild = storage.IdIndex._rebuild
+    monkeypatch.setattr(storage.IdIndex, "_rebuild", lambda index, items: (rebuilds.append(1), rebuild(index, items)))
+    json_store.apply_plan_ops([
+        {"op": "add", "type": "dailyPlans", "item": plan("new")},
+        {"op": "update", "type": "dailyPlans", "id": "new", "updates": {"content": "edited"}},
+        {"op": "update", "type": "dailyPlans", "id": "7", "updates": {"completed": True}},
+    ])
+
+    assert json_store.get_plan_item("dailyPlans", "new")["content"] == "edited"
+    assert json_store.get_plan_item("dailyPlans", "7")["completed"] is True
+    assert rebuilds == []
+
+
+def test_batch_applies_deletes_and_re_adds_in_order(json_store, tmp_path):
+    json_store.apply_plan_ops([{"op": "add", "type": "dailyPlans", "item": plan(str(n))} for n in range(5)])
+    version, results = json_store.apply_plan_ops([
+        {"op": "delete", "type": "dailyPlans", "id": "1"},
+        {"op": "delete", "type": "dailyPlans", "id": "2"},
+        {"op": "add", "type": "dailyPlans", "item": plan("1", content="again")},
+        {"op": "update", "type": "dailyPlans", "id": "3", "updates": {"id": "3b"}},
+        {"op": "update", "type": "dailyPlans", "id": "3b", "updates": {"completed": True}},
+        {"op": "delete", "type": "dailyPlans", "id": "4"},
+    ])
+
+    assert version == json_store.planning_version()
+    assert results[2]["content"] == "again" and results[4]["completed"] is True
+    assert daily_ids(json_store) == ["0", "3b", "1"]
+    assert json_store.get_plan_item("dailyPlans", "1")["content"] == "again"
+    json_store.shutdown()
+    reopened = open_json_store("json", tmp_path)
+    assert daily_ids(reopened) == ["0", "3b", "1"]
+    reopened.shutdown()
+
+
+def test_batch_is_all_or_nothing(json_store):
+    json_store.apply_plan_ops([{"op": "add", "type": "dailyPlans", "item": plan("a")}])
+    version = json_store.planning_version()
+
+    with pytest.raises(storage.VersionConflict):
+        json_store.apply_plan_ops([{"op": "delete", "type": "dailyPlans", "id": "a"}], base_version=version - 1)
+    with pytest.raises(storage.ItemNotFound):
+        json_store.apply_plan_ops([
+            {"op": "delete", "type": "dailyPlans", "id": "a"},
+            {"op": "update", "type": "dailyPlans", "id": "missing", "updates": {}},
+        ])
+
+    assert daily_ids(json_store) == ["a"]
+    assert json_store.planning_version() == version
+
+
+def learning(item_id, recap_dates, completed_dates=()):
+    return {"id": item_id, "date": recap_dates[0], "content": item_id,
+            "recap_dates": list(recap_dates), "completed_dates": list(completed_dates)}
+
+
+def test_whole_document_save_rebuilds_the_review_calendar(tmp_path):
+    store = open_json_store("json", tmp_path)
+    store.add_learning(learning("1", ["2026-03-01", "2026-03-02"]))
+    assert [day["due"] for day in store.review_schedule("2026-03-01", "2026-03-02")] == [1, 1]
+
+    # The cached list itself, edited in place and saved back whole
+    data = store.load_learnings()
+    data[0] = learning("1", ["2026-03-02"], completed_dates=["2026-03-02"])
+    store.save_learnings(data)
+
+    assert store.review_schedule("2026-03-01", "2026-03-02", include_items=False) == [
+        {"date": "2026-03-02", "due": 1, "completed": 1},
+    ]
+    store.shutdown()
+
+
+def test_point_writes_keep_the_review_calendar_current(tmp_path):
+    store = open_json_store("json", tmp_path)
+    store.add_learning(learning("1", ["2026-03-01"]))
+    store.add_learning(learning("2", ["2026-03-01", "2026-03-05"]))
+    store.update_learning(learning("1", ["2026-03-01"], completed_dates=["2026-03-01"]))
+    store.delete_learning("2")
+
+    assert store.reminders_between("2026-03-01", "2026-03-31") == {"2026-03-01": [store.get_learning("1")]}
+    assert store.review_schedule("2026-03-01", "2026-03-31", include_items=False) == [
+        {"date": "2026-03-01", "due": 1, "completed": 1},
+    ]
+    store.shutdown()
@@ -8,8 +8,10 @@ const usePlanningStorage = (planType) => {
     const [data, setData] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    // Server-side planning version, bumped on every change to any planning type
+    const [version, setVersion] = useState(null);
 
-    // Fetch data from backend
+    // Fetch data from backend; resolves to the planning version it was read at
     const fetchData = useCallback(async () => {
         try {
             setLoading(true);
@@ -17,7 +19,9 @@ const usePlanningStorage = (planType) => {
             if (response.ok) {
                 const result = await response.json();
                 setData(result[planType] || []);
+                setVersion(result.version ?? null);
                 setError(null);
+                return result.version ?? null;
             } else {
                 throw new Error(`Failed to fetch ${planType}`);
             }
@@ -25,6 +29,7 @@ const usePlanningStorage = (planType) => {
             console.error(`Error fetching ${planType}:`, err);
             setError(err.message);
             setData([]);
+            return null;
         } finally {
             setLoading(false);
         }
@@ -58,30 +63,68 @@ const usePlanningStorage = (planType) => {
         }
     }, [planType]);
 
+    // Send only the changed items; the backend applies them in one write. The
+    // batch carries the version our data was read at, so it is rejected (409) if
+    // planning changed meanwhile (here or in another tab); we then reload and
+    // apply the same operations once more, on top of the fresh data.
+    const applyOperations = useCallback(async (operations, applyLocally) => {
+        try {
+            let baseVersion = version;
+            for (let attempt = 0; ; attempt++) {
+                const response = await fetch('/api/planning/batch', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ operations, base_version: baseVersion })
+                });
+
+                if (response.ok) {
+                    const result = await response.json();
+                    setData(current => applyLocally(current));
+                    setVersion(result.version);
+                    setError(null);
+                    return true;
+                } else if (response.status === 409 && attempt === 0) {
+                    baseVersion = await fetchData();
+                } else {
+                    throw new Error(`Failed to update ${planType}`);
+                }
+            }
+        } catch (err) {
+            console.error(`Error updating ${planType}:`, err);
+            setError(err.message);
+            return false;
+        }
+    }, [planType, version, fetchData]);
+
     // Add a single item
     const addItem = useCallback(async (item) => {
-        const newData = [...data, item];
-        return await updateData(newData);
-    }, [data, updateData]);
+        return await applyOperations(
+            [{ op: 'add', type: planType, item }],
+            current => [...current, item]
+        );
+    }, [planType, applyOperations]);
 
     // Update a single item
     const updateItem = useCallback(async (id, updates) => {
-        const newData = data.map(item =>
-            item.id === id ? { ...item, ...updates } : item
+        return await applyOperations(
+            [{ op: 'update', type: planType, id, updates }],
+            current => current.map(item => item.id === id ? { ...item, ...updates } : item)
         );
-        return await updateData(newData);
-    }, [data, updateData]);
+    }, [planType, applyOperations]);
 
     // Delete a single item
     const deleteItem = useCallback(async (id) => {
-        const newData = data.filter(item => item.id !== id);
-        return await updateData(newData);
-    }, [data, updateData]);
+        return await applyOperations(
+            [{ op: 'delete', type: planType, id }],
+            current => current.filter(item => item.id !== id)
+        );
+    }, [planType, applyOperations]);
 
     return {
         data,
         loading,
         error,
+        version,
         setData: updateData,
         addItem,
         updateItem,